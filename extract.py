@@ -1,12 +1,23 @@
-import os
+import calendar
+import contextlib
+import hashlib
+import io
 import json
+import os
 import re
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, date
-from difflib import SequenceMatcher
+from functools import lru_cache
 from pathlib import Path
 
+import numpy as np
+import orjson
 from anthropic import Anthropic
 from dotenv import load_dotenv
+from rapidfuzz import fuzz, process, utils
 
 load_dotenv()
 
@@ -14,8 +25,281 @@ DATA_DIR = Path("data")
 RAW_EMAILS_FILE = "raw_emails.json"
 PTA_FILE = DATA_DIR / "pta_page.json"
 DISTRICT_FILE = DATA_DIR / "district_calendar.json"
+IMAGE_CACHE_FILE = DATA_DIR / "image_cache.json"
 EVENTS_OUTPUT_FILE = "events.json"
 
+# Retries for transient Claude API failures (rate limits, 5xx, timeouts),
+# done by the SDK with exponential backoff that honors retry-after
+LLM_MAX_RETRIES = 3
+
+# Claude calls in flight at once across all extraction phases and their
+# image/menu pools, which would otherwise add up to ~25 on one client
+LLM_CONCURRENCY = 8
+_LLM_SLOTS = threading.BoundedSemaphore(LLM_CONCURRENCY)
+
+# Concurrent vision calls / downloads when analyzing flyer and newsletter
+# images; also caps the concurrent per-file menu extractions
+IMAGE_WORKERS = 8
+
+# PTA flyer images identified together in one vision request
+IMAGES_PER_REQUEST = 10
+
+# Rules shared by every extraction call, sent as the system prompt; user
+# prompts only add what is specific to their source. Not marked for prompt
+# caching: Haiku 3 only caches prefixes of 2048+ tokens and this is far shorter.
+SYSTEM_PROMPT = """You extract events from school-related text for parents of an elementary school student.
+
+Report the events with the report_events tool. Each event is an object with these fields:
+- "name": Event name
+- "date": Date in YYYY-MM-DD format (null if unclear)
+- "type": "event" or "deadline"
+- "priority": "high", "medium", or "low"
+- "description": Brief description including any relevant details
+- "url": Registration, sign-up, or related URL if mentioned (null if none)
+
+The user message describes the source and may add fields or refine the ones above.
+
+RULES:
+- Current school year: Fall 2025, Spring 2026
+- Use dates exactly as they appear in the source; never invent events"""
+
+# Per-source instructions, sent ahead of the date and source content
+# (see _user_content).
+EMAIL_INSTRUCTIONS = """Extract ALL upcoming events and deadlines from these school emails.
+
+Fields for this source:
+- "priority": "high" for dances/major events, "medium" for meetings, "low" for minor items
+- "description": IMPORTANT - Include what PARENTS NEED TO DO. For classroom events, include specific instructions like "Bring 22 Valentine's cards with only your child's name (leave To: blank)" or "Wear sports shirt". Don't just say "classroom party" - include the actionable details from the newsletter.
+- "location": Location/venue if mentioned (e.g., "Cafeteria", "Library", "MPR", "Gym") - null if not specified
+- "image_url": Flyer or event image URL if found near the event mention (look for .jpg, .png, .jpeg URLs from s3.amazonaws.com or cdn.filestackcontent.com) - null if none
+
+EXTRACT events relevant to ELEMENTARY SCHOOL students and parents:
+- ALL PTA events (dances, meetings, fundraisers, etc.)
+- ALL classroom events (Valentine's Day parties, celebrations, spirit days, etc.)
+- School holidays and no-school days
+- Minimum days / early dismissal
+- Tours, info nights, workshops for elementary
+- Any deadlines or due dates relevant to elementary students
+- Events from the NEWSLETTER IMAGES section below (these are extracted from teacher newsletters)
+
+DO NOT EXTRACT:
+- Middle school information nights or events
+- High school information nights or events
+- Events specific to a named middle or high school
+- District committee or board meetings
+
+DATE PARSING RULES:
+- School newsletters have calendar tables with month columns (JANUARY, FEBRUARY, MARCH)
+- When you see "6th - Event Name" under a month column, that's the date for THAT month
+
+BE THOROUGH - extract every single event you find in the calendar sections."""
+
+PTA_INSTRUCTIONS = """Extract ALL upcoming events from this PTA website page.
+
+Fields for this source:
+- "time": Time of event if mentioned (e.g., "6:00 PM - 8:00 PM"), null if not stated
+- "priority": "high" for dances/fundraisers/major school events, "medium" for meetings/assemblies, "low" for minor items
+- "location": Location/venue if mentioned (e.g., "Cafeteria", "Library", "MPR", "Gym", "Auditorium") - null if not specified
+- "url": Registration, sign-up, or related URL if mentioned (null if none). Look carefully for hyperlinks near event descriptions — include signup.com, Google Forms, external sites, etc.
+- "image_url": Flyer or event image URL if found (look for .jpg, .png, .jpeg image URLs) - null if none
+- "source": "pta_website"
+
+EXTRACT EVERYTHING INCLUDING:
+- PTA events (dances, fundraisers, socials, Galentine's Night Out, etc.)
+- School assemblies and performances (Author Assembly, Variety Show, etc.)
+- PTA meetings
+- Volunteer opportunities
+- Deadlines for sign-ups or registrations
+- Any other events or dates mentioned
+
+IMPORTANT:
+- Capture any URLs associated with events. Look for links labeled "HERE", "Sign Up", "Register", or embedded in the text near event descriptions.
+- Match images to events based on the image descriptions provided. If an image description matches an event name, use that image URL for the event's image_url field.
+
+RULES:
+- If a date is ambiguous, use the next upcoming occurrence
+- Include as much detail as available (times, locations, costs, links)"""
+
+DISTRICT_INSTRUCTIONS = """Extract upcoming events from this SJUSD district calendar that are relevant to ELEMENTARY SCHOOL students and parents.
+
+Fields for this source:
+- "time": Time of event if mentioned (e.g., "6:00 PM - 8:00 PM"), null if not stated
+- "priority": "high" for school holidays/no-school days, "medium" for other events, "low" for minor items
+- "description": Brief description including location if available
+- "source": "district_calendar"
+
+ONLY EXTRACT events that affect ELEMENTARY schools:
+- School holidays and recesses that affect ALL schools (Winter Recess, Spring Break, MLK Day, etc.)
+- Early dismissal or minimum days for elementary or all schools
+- District-wide events that affect elementary students
+
+DO NOT EXTRACT:
+- Middle school information nights
+- High school information nights
+- Board of Education meetings
+- District committee meetings (PTOC, Schools of Tomorrow, CSH, VIP, etc.)
+- Advisory committees
+- Secondary-school-only early dismissals
+- Any event specific to a named middle or high school
+- Webinars or seminars for district staff
+
+RULES:
+- For recesses and no-school days, set priority to "high"."""
+
+# Tool every extraction call must answer with, so events come back as
+# schema-checked tool input instead of JSON embedded in text. Per-source
+# fields described in the prompts (time, location, image_url, source) are
+# passed through as extra properties.
+EVENTS_TOOL = {
+    "name": "report_events",
+    "description": "Report the events extracted from the source.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "events": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "date": {"type": ["string", "null"], "description": "YYYY-MM-DD"},
+                        "type": {"type": "string"},
+                        "priority": {"type": "string", "enum": ["high", "medium", "low"]},
+                        "description": {"type": "string"},
+                        "url": {"type": ["string", "null"]},
+                    },
+                    "required": ["name", "date", "type", "priority", "description"],
+                },
+            },
+        },
+        "required": ["events"],
+    },
+}
+
+# Added to the request when a report_events call runs out of output tokens:
+# a cut-off tool input is lost, but complete items of a text array are not
+JSON_FALLBACK_PROMPT = "Do not use a tool. Return ONLY a JSON array of the events, with no other text."
+
+# District calendar entries the extraction prompt excludes anyway
+_DISTRICT_DROP_RE = re.compile(
+    r'board (?:of education|meeting)|\bPTOC\b|schools of tomorrow|\bCSH\b|\bVIP\b'
+    r'|(?:middle|high) school information night|secondary schools out|webinar|seminario web'
+    r'|advisory committee|oversight committee',
+    re.IGNORECASE,
+)
+
+# Time fragments and street addresses listed under a district calendar entry
+_DISTRICT_DETAIL_RE = re.compile(r'^(?:\d{1,2}|:|-|[AP]M|All Day|.*, CA \d{5}.*)$')
+
+# Characters ignored when comparing event names for exact duplicates
+_NON_WORD_RE = re.compile(r'\W+')
+
+MONTH_MAP = {
+    "january": 1, "february": 2, "march": 3, "april": 4,
+    "may": 5, "june": 6, "july": 7, "august": 8,
+    "september": 9, "october": 10, "november": 11, "december": 12,
+}
+
+# Student calendar date ranges like "16-20February Winter recess" or
+# "26-28November Thanksgiving recess". Also handles single-day patterns
+# like "19December All schools out 2 hours early". The month is matched as a
+# plain word and checked against MONTH_MAP instead of a 12-way alternation
+_CAL_RANGE_RE = re.compile(
+    r'(\d{1,2})(?:-(\d{1,2}))?\s*([A-Za-z]{3,9})\s+(.+?)(?:\n|$)',
+)
+
+# Keywords that classify a student calendar description, matched in one pass
+_DESC_RE = re.compile(
+    r'(?P<no_school>no school)|(?P<recess>recess|holiday)|(?P<early>early)'
+    r'|(?P<secondary>secondary)|(?P<all>\ball\b)',
+    re.IGNORECASE,
+)
+
+# Keywords that mark a multi-day event to consolidate into a date range
+_CONSOLIDATE_RE = re.compile(r'recess|no school|holiday|break|vacation', re.IGNORECASE)
+
+
+def _load_json(path):
+    """Read and decode a JSON file with orjson."""
+    return orjson.loads(Path(path).read_bytes())
+
+
+def _dump_json(obj, path):
+    """Write obj to path as 2-space indented JSON with orjson."""
+    Path(path).write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+
+
+def _user_content(instructions, prompt):
+    """User message text: source instructions, then the per-run prompt."""
+    return f"{instructions}\n\n{prompt}"
+
+
+def _create_events(client, **kwargs):
+    """Run an extraction call forced to answer through the report_events tool.
+
+    A tool call cut off at max_tokens has incomplete input, so the request is
+    then repeated for a plain JSON array and every complete item is kept.
+    Returns the reported events as a list, or None if no events were reported.
+    """
+    response = _create_message(
+        client,
+        tools=[EVENTS_TOOL],
+        tool_choice={"type": "tool", "name": EVENTS_TOOL["name"]},
+        **kwargs,
+    )
+    if response.stop_reason == "max_tokens":
+        print("    WARNING: Response hit max_tokens, retrying as a JSON array")
+        return _create_events_as_text(client, **kwargs)
+    for block in response.content:
+        if block.type == "tool_use":
+            return _event_list(block.input.get("events"))
+    return None
+
+
+def _create_events_as_text(client, messages, **kwargs):
+    """Repeat an extraction asking for a JSON array; keeps items that parse."""
+    last = messages[-1]
+    content = last["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    messages = messages[:-1] + [
+        {**last, "content": [*content, {"type": "text", "text": JSON_FALLBACK_PROMPT}]},
+    ]
+    response = _create_message(client, messages=messages, **kwargs)
+    text = "".join(block.text for block in response.content if block.type == "text")
+    return _event_list(parse_json_response(text))
+
+
+def _event_list(events):
+    """Events as a list of dicts, or None.
+
+    Haiku sometimes sends the events array as a JSON string.
+    """
+    if isinstance(events, str):
+        events = parse_json_response(events)
+    if not isinstance(events, list):
+        return None
+    return [event for event in events if isinstance(event, dict)] or None
+
+
+def _create_message(client, **kwargs):
+    """client.messages.create, waiting for one of the LLM_CONCURRENCY slots."""
+    with _LLM_SLOTS:
+        return client.messages.create(**kwargs)
+
+
+@lru_cache(maxsize=1)
+def _anthropic_client():
+    """Shared Anthropic client, so every extraction call reuses one connection pool."""
+    return Anthropic(max_retries=LLM_MAX_RETRIES)
+
+
+@lru_cache(maxsize=1)
+def _http_session():
+    """Shared requests session, so image downloads reuse TLS connections."""
+    import requests as req
+    return req.Session()
+
 
 def load_raw_emails():
     """Load raw emails from JSON file."""
@@ -23,8 +307,7 @@ def load_raw_emails():
         print(f"WARNING: {RAW_EMAILS_FILE} not found. Run ingest.py first.")
         return []
 
-    with open(RAW_EMAILS_FILE) as f:
-        return json.load(f)
+    return _load_json(RAW_EMAILS_FILE)
 
 
 def load_current_menus():
@@ -43,23 +326,7 @@ def load_current_menus():
         next_month = datetime(now.year, now.month + 1, 1)
     next_suffix = f"{next_month.strftime('%b').upper()}_{next_month.year}"
 
-    menus = []
-
-    for menu_type in ["breakfast", "lunch"]:
-        for suffix in [current_suffix, next_suffix]:
-            pattern = f"menu_elementary_{menu_type}_{suffix}*.json"
-            for filepath in DATA_DIR.glob(pattern):
-                with open(filepath) as f:
-                    data = json.load(f)
-
-                # Skip allergen/protein files - they don't have daily schedules
-                original_filename = data.get("original_filename", "")
-                if "allergen" in original_filename.lower() or "protein" in original_filename.lower():
-                    print(f"  Skipping allergen file: {filepath.name}")
-                    continue
-
-                data["_filename"] = filepath.name
-                menus.append(data)
+    menus = list(_load_menus(current_suffix, next_suffix))
 
     if not menus:
         print(f"WARNING: No menu files found in {DATA_DIR}. Run scrape_web.py first.")
@@ -67,14 +334,56 @@ def load_current_menus():
     return menus
 
 
+@lru_cache(maxsize=1)
+def _load_menus(current_suffix, next_suffix):
+    """Read the elementary menu files for the given month suffixes in one directory scan.
+
+    Files are named like menu_elementary_lunch_FEB_2026_2.json. Results are
+    ordered breakfast before lunch, then current month before next month.
+    """
+    # Wanted filename prefix -> (meal type order, month order)
+    wanted = {
+        f"menu_elementary_{meal_type}_{suffix}": (i, j)
+        for i, meal_type in enumerate(("breakfast", "lunch"))
+        for j, suffix in enumerate((current_suffix, next_suffix))
+    }
+
+    if not DATA_DIR.is_dir():
+        return ()
+
+    matches = []
+    with os.scandir(DATA_DIR) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            for prefix, order in wanted.items():
+                if entry.name.startswith(prefix):
+                    matches.append((*order, entry.name, Path(entry.path)))
+                    break
+
+    menus = []
+    for *_, filepath in sorted(matches):
+        data = _load_json(filepath)
+
+        # Skip allergen/protein files - they don't have daily schedules
+        original_filename = data.get("original_filename", "")
+        if "allergen" in original_filename.lower() or "protein" in original_filename.lower():
+            print(f"  Skipping allergen file: {filepath.name}")
+            continue
+
+        data["_filename"] = filepath.name
+        menus.append(data)
+
+    return tuple(menus)
+
+
 def load_pta_page():
     """Load scraped PTA page data including images."""
     if not PTA_FILE.exists():
         print(f"WARNING: {PTA_FILE} not found. Run scrape_pta.py first.")
         return None, []
 
-    with open(PTA_FILE) as f:
-        data = json.load(f)
+    data = _load_json(PTA_FILE)
 
     text = data.get("text", "")
     images = data.get("images", [])
@@ -117,10 +426,9 @@ def extract_newsletter_images(emails):
 def analyze_newsletter_image(client, image_url):
     """Use vision to extract events and dates from a newsletter image."""
     import base64
-    import requests as req
 
     try:
-        response = req.get(image_url, timeout=15)
+        response = _http_session().get(image_url, timeout=15)
         if response.status_code != 200:
             return None
 
@@ -132,7 +440,8 @@ def analyze_newsletter_image(client, image_url):
         else:
             media_type = "image/jpeg"
 
-        result = client.messages.create(
+        result = _create_message(
+            client,
             model="claude-3-haiku-20240307",
             max_tokens=1000,
             messages=[{
@@ -175,121 +484,104 @@ Focus on actionable information parents need to prepare for. If no events/dates
 
 def extract_events_from_emails(emails):
     """Extract events/deadlines from emails (separate from menus)."""
-    client = Anthropic()
+    client = _anthropic_client()
 
     now = datetime.now()
 
     # Extract and analyze newsletter images first
     newsletter_images = extract_newsletter_images(emails)
-    newsletter_content = ""
+    newsletter_buf = io.StringIO()
 
     if newsletter_images:
         print(f"  Analyzing {len(newsletter_images)} newsletter images with vision...")
-        for img in newsletter_images[:8]:  # Limit to 8 most recent images
-            content = analyze_newsletter_image(client, img['url'])
+        recent_images = newsletter_images[:8]  # Limit to 8 most recent images
+        with _phase_pool(IMAGE_WORKERS) as executor:
+            contents = list(executor.map(
+                lambda img: analyze_newsletter_image(client, img['url']), recent_images
+            ))
+        for img, content in zip(recent_images, contents):
             if content and "no events found" not in content.lower():
-                newsletter_content += f"\n\nFROM NEWSLETTER IMAGE ({img['source']}):\n{content}"
+                newsletter_buf.write(f"\n\nFROM NEWSLETTER IMAGE ({img['source']}):\n")
+                newsletter_buf.write(content)
                 print(f"    Extracted events from: {img['source'][:50]}")
 
+    newsletter_content = newsletter_buf.getvalue()
+
     # Use only the most recent emails (they have the most current calendar)
     # Sort by date descending and take recent ones
     sorted_emails = sorted(emails, key=lambda x: x.get('date', ''), reverse=True)
 
-    # Take the 10 most recent emails with full content
-    email_texts = []
-    for email in sorted_emails[:10]:
-        text = email.get('text', '')
-        subject = email.get('subject', '')
-        email_texts.append(f"Subject: {subject}\nEmail Date: {email['date']}\n{text}")
-
-    combined_emails = "\n\n---\n\n".join(email_texts)
-
-    prompt = f"""Extract ALL upcoming events and deadlines from these school emails.
-
-TODAY'S DATE: {now.strftime('%Y-%m-%d')}
-
-Return a JSON array with these fields:
-- "name": Event name
-- "date": Date in YYYY-MM-DD format (null if unclear)
-- "type": "event" or "deadline"
-- "priority": "high" for dances/major events, "medium" for meetings, "low" for minor items
-- "description": IMPORTANT - Include what PARENTS NEED TO DO. For classroom events, include specific instructions like "Bring 22 Valentine's cards with only your child's name (leave To: blank)" or "Wear sports shirt". Don't just say "classroom party" - include the actionable details from the newsletter.
-- "location": Location/venue if mentioned (e.g., "Cafeteria", "Library", "MPR", "Gym") - null if not specified
-- "url": Registration or sign-up URL if mentioned (null if none)
-- "image_url": Flyer or event image URL if found near the event mention (look for .jpg, .png, .jpeg URLs from s3.amazonaws.com or cdn.filestackcontent.com) - null if none
-
-EXTRACT events relevant to ELEMENTARY SCHOOL students and parents:
-- ALL PTA events (dances, meetings, fundraisers, etc.)
-- ALL classroom events (Valentine's Day parties, celebrations, spirit days, etc.)
-- School holidays and no-school days
-- Minimum days / early dismissal
-- Tours, info nights, workshops for elementary
-- Any deadlines or due dates relevant to elementary students
-- Events from the NEWSLETTER IMAGES section below (these are extracted from teacher newsletters)
-
-DO NOT EXTRACT:
-- Middle school information nights or events
-- High school information nights or events
-- Events specific to a named middle or high school
-- District committee or board meetings
+    # Take the 10 most recent emails with full content, written straight
+    # into one buffer rather than formatted per email and joined
+    email_buf = io.StringIO()
+    for i, email in enumerate(sorted_emails[:10]):
+        if i:
+            email_buf.write("\n\n---\n\n")
+        email_buf.write("Subject: ")
+        email_buf.write(email.get('subject') or '')
+        email_buf.write("\nEmail Date: ")
+        email_buf.write(email['date'] or '')
+        email_buf.write("\n")
+        email_buf.write(email.get('text') or '')
 
-DATE PARSING RULES:
-- School newsletters have calendar tables with month columns (JANUARY, FEBRUARY, MARCH)
-- When you see "6th - Event Name" under a month column, that's the date for THAT month
-- Current school year: Fall 2025, Spring 2026
-- Only extract events dated {now.strftime('%B %Y')} or later
+    combined_emails = email_buf.getvalue()
 
-BE THOROUGH - extract every single event you find in the calendar sections.
+    prompt = f"""TODAY'S DATE: {now.strftime('%Y-%m-%d')}
+Only extract events dated {now.strftime('%B %Y')} or later.
 
 ## EMAILS:
 {combined_emails}
 
 ## NEWSLETTER IMAGES CONTENT (extracted via vision):
-{newsletter_content if newsletter_content else "No newsletter images found."}
+{newsletter_content if newsletter_content else "No newsletter images found."}"""
 
-Return ONLY valid JSON array, no other text."""
-
-    response = client.messages.create(
+    return _create_events(
+        client,
         model="claude-3-haiku-20240307",
         max_tokens=4096,
-        messages=[{"role": "user", "content": prompt}]
+        system=SYSTEM_PROMPT,
+        messages=[{"role": "user", "content": _user_content(EMAIL_INSTRUCTIONS, prompt)}]
     )
 
-    return response.content[0].text
-
 
 def extract_menus(menus):
     """Extract daily menu items from menu files.
 
     Process each menu file separately to ensure correct month assignment.
+    The per-file calls are independent and run concurrently.
     """
-    client = Anthropic()
+    client = _anthropic_client()
 
-    all_items = []
+    with _phase_pool(IMAGE_WORKERS) as executor:
+        per_menu = executor.map(lambda menu: _extract_menu_items(client, menu), menus)
+        return [item for items in per_menu for item in items]
 
-    for menu in menus:
-        meal_type = menu.get("meal_type", "menu")
-        month_str = menu.get("month", "")
 
-        # Parse month/year from the menu's month field (e.g., "February 2026")
-        try:
-            month_date = datetime.strptime(month_str, "%B %Y")
-            year = month_date.year
-            month = month_date.month
-        except ValueError:
-            # Fallback to current month if parsing fails
-            now = datetime.now()
-            year = now.year
-            month = now.month
-
-        prompt = f"""Extract daily menu items from this school {meal_type} menu for {month_str}.
-
-Return a JSON array with these fields:
+def _extract_menu_items(client, menu):
+    """Extract the daily items from a single menu file. Returns a list."""
+    meal_type = menu.get("meal_type", "menu")
+    month_str = menu.get("month", "")
+
+    # Parse month/year from the menu's month field (e.g., "February 2026")
+    try:
+        month_date = datetime.strptime(month_str, "%B %Y")
+        year = month_date.year
+        month = month_date.month
+    except ValueError:
+        # Fallback to current month if parsing fails
+        now = datetime.now()
+        year = now.year
+        month = now.month
+
+    prompt = f"""Extract daily menu items from this school {meal_type} menu for {month_str}.
+
+Fields for this source (one item per school day):
 - "name": First menu item name for that day
 - "date": Date in YYYY-MM-DD format
 - "type": "{meal_type}_menu"
 - "priority": "low"
 - "description": All meal options listed for that day
+- "url": null
 
 The menu is for {month_str}. Use these dates:
 - Day 2 = {year}-{month:02d}-02
@@ -303,36 +595,21 @@ The menu is for {month_str}. Use these dates:
 Skip days marked "NO SCHOOL".
 
 Menu content:
-{menu['text']}
+{menu['text']}"""
 
-Return ONLY valid JSON array, no other text."""
-
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=4096,
-            messages=[{"role": "user", "content": prompt}]
-        )
-
-        result = response.content[0].text
-
-        # Parse the result and add to all_items
-        try:
-            items = json.loads(result)
-            all_items.extend(items)
-            print(f"    {menu['_filename']}: {len(items)} items")
-        except json.JSONDecodeError:
-            # Try to extract JSON from the response
-            import re
-            match = re.search(r'\[.*\]', result, re.DOTALL)
-            if match:
-                try:
-                    items = json.loads(match.group())
-                    all_items.extend(items)
-                    print(f"    {menu['_filename']}: {len(items)} items (extracted)")
-                except json.JSONDecodeError:
-                    print(f"    {menu['_filename']}: Failed to parse")
+    items = _create_events(
+        client,
+        model="claude-3-haiku-20240307",
+        max_tokens=4096,
+        system=SYSTEM_PROMPT,
+        messages=[{"role": "user", "content": prompt}]
+    )
 
-    return json.dumps(all_items)
+    if items is None:
+        print(f"    {menu['_filename']}: No items reported")
+        return []
+    print(f"    {menu['_filename']}: {len(items)} items")
+    return items
 
 
 def load_district_calendar():
@@ -341,8 +618,7 @@ def load_district_calendar():
         print(f"WARNING: {DISTRICT_FILE} not found. Run scrape_district.py first.")
         return None
 
-    with open(DISTRICT_FILE) as f:
-        data = json.load(f)
+    data = _load_json(DISTRICT_FILE)
 
     parts = []
     if data.get("text"):
@@ -363,8 +639,7 @@ def parse_student_calendar_dates():
     if not DISTRICT_FILE.exists():
         return []
 
-    with open(DISTRICT_FILE) as f:
-        data = json.load(f)
+    data = _load_json(DISTRICT_FILE)
 
     text = data.get("student_calendar", "")
     if not text:
@@ -379,30 +654,21 @@ def parse_student_calendar_dates():
         fall_year = now.year - 1
     spring_year = fall_year + 1
 
-    MONTH_MAP = {
-        "january": 1, "february": 2, "march": 3, "april": 4,
-        "may": 5, "june": 6, "july": 7, "august": 8,
-        "september": 9, "october": 10, "november": 11, "december": 12,
-    }
-
-    # Match patterns like "16-20February Winter recess" or "26-28November Thanksgiving recess"
-    # Also handles single-day patterns like "19December All schools out 2 hours early"
-    pattern = re.compile(
-        r'(\d{1,2})(?:-(\d{1,2}))?\s*(January|February|March|April|May|June|July|August|September|October|November|December)\s+(.+?)(?:\n|$)',
-        re.IGNORECASE,
-    )
+    ranges = []
 
-    events = []
-    today = now.date()
+    pos = 0
+    while match := _CAL_RANGE_RE.search(text, pos):
+        month_num = MONTH_MAP.get(match.group(3).lower())
+        if month_num is None:
+            # Not a month name; keep scanning right after the day number
+            pos = match.start(3)
+            continue
+        pos = match.end()
 
-    for match in pattern.finditer(text):
         start_day = int(match.group(1))
         end_day = int(match.group(2)) if match.group(2) else start_day
-        month_name = match.group(3)
         description = match.group(4).strip()
 
-        month_num = MONTH_MAP[month_name.lower()]
-
         # Assign the right year based on month (Aug-Dec = fall_year, Jan-Jul = spring_year)
         if month_num >= 8:
             year = fall_year
@@ -410,17 +676,17 @@ def parse_student_calendar_dates():
             year = spring_year
 
         # Determine if this is a no-school/recess event
-        desc_lower = description.lower()
-        is_no_school = any(kw in desc_lower for kw in ["recess", "no school", "holiday"])
-        is_early_release = "hours early" in desc_lower or "early" in desc_lower
+        flags = {m.lastgroup for m in _DESC_RE.finditer(description)}
+        is_no_school = "no_school" in flags or "recess" in flags
+        is_early_release = "early" in flags
 
         # Skip secondary-only early release days
-        if "secondary" in desc_lower and "all" not in desc_lower:
+        if "secondary" in flags and "all" not in flags:
             continue
 
         if is_no_school:
             event_name = description.rstrip(".")
-            if "no school" not in event_name.lower():
+            if "no_school" not in flags:
                 event_name = f"{event_name} (No School)"
             priority = "high"
         elif is_early_release:
@@ -430,72 +696,86 @@ def parse_student_calendar_dates():
             # Skip non-relevant items (graduation ceremonies, extended year, etc.)
             continue
 
-        # Create one event per day in the range
-        for day in range(start_day, end_day + 1):
-            try:
-                event_date = date(year, month_num, day)
-            except ValueError:
-                continue
-
-            if event_date < today:
-                continue
-
-            # Skip weekends
-            if event_date.weekday() >= 5:
-                continue
+        # Clamp the range to the month so every date in it is valid
+        end_day = min(end_day, calendar.monthrange(year, month_num)[1])
+        if not 1 <= start_day <= end_day:
+            continue
 
-            events.append({
-                "name": event_name,
-                "date": event_date.isoformat(),
-                "time": None,
-                "type": "event",
-                "priority": priority,
-                "description": description,
-                "url": None,
-                "source": "student_calendar",
-            })
+        template = {
+            "name": event_name,
+            "date": None,
+            "time": None,
+            "type": "event",
+            "priority": priority,
+            "description": description,
+            "url": None,
+            "source": "student_calendar",
+        }
+
+        ranges.append((date(year, month_num, start_day), date(year, month_num, end_day), template))
+
+    # Create one event per weekday in each range, skipping weekends and past
+    # dates with numpy masks instead of per-day checks
+    events = []
+    today = np.datetime64(now.date())
+    for first, last, template in ranges:
+        days = np.arange(np.datetime64(first), np.datetime64(last) + 1)
+        for day in days[np.is_busday(days) & (days >= today)].astype(str).tolist():
+            events.append(template | {"date": day})
 
     return events
 
 
-def analyze_image_content(client, image_url):
-    """Use vision to understand what an image contains."""
+def _download_image(image_url):
+    """Download an image and return it as a base64 image content block, or None."""
     import base64
-    import requests as req
 
     try:
-        # Download image
-        response = req.get(image_url, timeout=10)
-        if response.status_code != 200:
-            return None
+        response = _http_session().get(image_url, timeout=10)
+    except Exception as e:
+        print(f"    Error downloading image: {e}")
+        return None
+    if response.status_code != 200:
+        return None
 
-        # Encode as base64
-        image_data = base64.standard_b64encode(response.content).decode("utf-8")
+    # Encode as base64
+    image_data = base64.standard_b64encode(response.content).decode("utf-8")
+
+    # Determine media type
+    content_type = response.headers.get("content-type", "image/jpeg")
+    if "png" in content_type or image_url.endswith(".png"):
+        media_type = "image/png"
+    elif "gif" in content_type:
+        media_type = "image/gif"
+    else:
+        media_type = "image/jpeg"
+
+    return {
+        "type": "image",
+        "source": {
+            "type": "base64",
+            "media_type": media_type,
+            "data": image_data,
+        }
+    }
 
-        # Determine media type
-        content_type = response.headers.get("content-type", "image/jpeg")
-        if "png" in content_type or image_url.endswith(".png"):
-            media_type = "image/png"
-        elif "gif" in content_type:
-            media_type = "image/gif"
-        else:
-            media_type = "image/jpeg"
 
+def analyze_image_content(client, image_url):
+    """Use vision to understand what an image contains."""
+    image_block = _download_image(image_url)
+    if image_block is None:
+        return None
+
+    try:
         # Ask Claude to describe the image
-        result = client.messages.create(
+        result = _create_message(
+            client,
             model="claude-3-haiku-20240307",
             max_tokens=200,
             messages=[{
                 "role": "user",
                 "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": media_type,
-                            "data": image_data,
-                        }
-                    },
+                    image_block,
                     {
                         "type": "text",
                         "text": "What event or activity is this flyer/image about? Reply with just the event name or 'unknown' if not an event flyer. Keep it to 5 words max."
@@ -509,9 +789,99 @@ def analyze_image_content(client, image_url):
         return None
 
 
+def _image_cache_key(image_url):
+    """Short, stable cache key for an image URL."""
+    return hashlib.sha256(image_url.encode()).hexdigest()[:16]
+
+
+def analyze_image_contents(client, image_urls):
+    """Identify what each image is about, several images per vision request.
+
+    Descriptions are cached in IMAGE_CACHE_FILE by URL, so flyers seen on an
+    earlier run are neither downloaded nor sent to Claude again.
+
+    Returns descriptions aligned with image_urls (None where an image could
+    not be downloaded or analyzed).
+    """
+    cache = _load_json(IMAGE_CACHE_FILE) if IMAGE_CACHE_FILE.exists() else {}
+    keys = [_image_cache_key(url) for url in image_urls]
+
+    hits = sum(key in cache for key in keys)
+    if hits:
+        print(f"    {hits} images cached from earlier runs")
+    misses = list(dict.fromkeys(url for url, key in zip(image_urls, keys) if key not in cache))
+
+    for i in range(0, len(misses), IMAGES_PER_REQUEST):
+        batch = misses[i:i + IMAGES_PER_REQUEST]
+        for url, description in zip(batch, _analyze_image_batch(client, batch)):
+            # Failures aren't cached so they are retried next run
+            if description is not None:
+                cache[_image_cache_key(url)] = description
+
+    if misses:
+        DATA_DIR.mkdir(exist_ok=True)
+        _dump_json(cache, IMAGE_CACHE_FILE)
+
+    return [cache.get(key) for key in keys]
+
+
+def _analyze_image_batch(client, image_urls):
+    """Send one vision request for a batch of images; see analyze_image_contents."""
+    with _phase_pool(IMAGE_WORKERS) as executor:
+        image_blocks = list(executor.map(_download_image, image_urls))
+
+    # Label each downloaded image so the reply can be matched back to its URL
+    content = []
+    labeled_urls = []
+    for url, image_block in zip(image_urls, image_blocks):
+        if image_block is None:
+            continue
+        labeled_urls.append(url)
+        content.append({"type": "text", "text": f"Image {len(labeled_urls)}:"})
+        content.append(image_block)
+
+    if not labeled_urls:
+        return [None] * len(image_urls)
+
+    count = len(labeled_urls)
+    content.append({
+        "type": "text",
+        "text": f"For each of the {count} images above, what event or activity is this flyer/image about? "
+                f"Reply with ONLY a JSON array of {count} strings in image order, each just the event name "
+                "(5 words max) or 'unknown' if not an event flyer."
+    })
+
+    try:
+        result = _create_message(
+            client,
+            model="claude-3-haiku-20240307",
+            max_tokens=1000,
+            messages=[{"role": "user", "content": content}]
+        )
+        names = parse_json_response(result.content[0].text)
+    except Exception as e:
+        print(f"    Error analyzing images: {e}")
+        names = None
+
+    if isinstance(names, list) and len(names) == count:
+        by_url = {url: _image_name(name) for url, name in zip(labeled_urls, names)}
+    else:
+        # Reply didn't line up with the images; ask about each one separately
+        by_url = {url: analyze_image_content(client, url) for url in labeled_urls}
+
+    return [by_url.get(url) for url in image_urls]
+
+
+def _image_name(name):
+    """A name from the batch reply, or None (not cached) if it isn't a non-empty string."""
+    if not isinstance(name, str):
+        return None
+    return name.strip() or None
+
+
 def extract_events_from_pta(pta_text, pta_images=None):
     """Extract events from PTA website text and images."""
-    client = Anthropic()
+    client = _anthropic_client()
 
     now = datetime.now()
 
@@ -522,7 +892,8 @@ def extract_events_from_pta(pta_text, pta_images=None):
     if pta_images:
         print("  Analyzing images with vision...")
         images_context = "\n\nIMAGES FOUND ON PAGE:\n"
-        for i, img in enumerate(pta_images):
+        urls = []
+        for img in pta_images:
             # Extract clean URL from Google proxy URLs
             url = img.get("url", "")
             if "#" in url:
@@ -531,123 +902,172 @@ def extract_events_from_pta(pta_text, pta_images=None):
             # Skip small icons and logos
             if any(x in url.lower() for x in ["button", "header", "logo"]):
                 continue
+            urls.append(url)
+
+        # Analyze image content, several images per request
+        descriptions = analyze_image_contents(client, urls)
 
-            # Analyze image content
-            description = analyze_image_content(client, url)
+        for url, description in zip(urls, descriptions):
             if description and description.lower() != "unknown":
                 images_context += f"- Image about '{description}': {url}\n"
                 image_map[description.lower()] = url
                 print(f"    Found: {description}")
 
-    prompt = f"""Extract ALL upcoming events from this PTA website page.
+    prompt = f"""TODAY'S DATE: {now.strftime('%Y-%m-%d')}
+Only extract events dated {now.strftime('%Y-%m-%d')} or later.
 
-TODAY'S DATE: {now.strftime('%Y-%m-%d')}
+## PTA WEBSITE CONTENT:
+{pta_text}
+{images_context}"""
 
-Return a JSON array with these fields:
-- "name": Event name
-- "date": Date in YYYY-MM-DD format (null if unclear)
-- "time": Time of event if mentioned (e.g., "6:00 PM - 8:00 PM"), null if not stated
-- "type": "event" or "deadline"
-- "priority": "high" for dances/fundraisers/major school events, "medium" for meetings/assemblies, "low" for minor items
-- "description": Brief description including any relevant details
-- "location": Location/venue if mentioned (e.g., "Cafeteria", "Library", "MPR", "Gym", "Auditorium") - null if not specified
-- "url": Registration, sign-up, or related URL if mentioned (null if none). Look carefully for hyperlinks near event descriptions — include signup.com, Google Forms, external sites, etc.
-- "image_url": Flyer or event image URL if found (look for .jpg, .png, .jpeg image URLs) - null if none
-- "source": "pta_website"
+    return _create_events(
+        client,
+        model="claude-3-haiku-20240307",
+        max_tokens=4096,
+        system=SYSTEM_PROMPT,
+        messages=[{"role": "user", "content": _user_content(PTA_INSTRUCTIONS, prompt)}]
+    )
 
-EXTRACT EVERYTHING INCLUDING:
-- PTA events (dances, fundraisers, socials, Galentine's Night Out, etc.)
-- School assemblies and performances (Author Assembly, Variety Show, etc.)
-- PTA meetings
-- Volunteer opportunities
-- Deadlines for sign-ups or registrations
-- Any other events or dates mentioned
 
-IMPORTANT:
-- Capture any URLs associated with events. Look for links labeled "HERE", "Sign Up", "Register", or embedded in the text near event descriptions.
-- Match images to events based on the image descriptions provided. If an image description matches an event name, use that image URL for the event's image_url field.
+def _filter_district_text(district_text, covered_descriptions=()):
+    """Drop district calendar lines that would only be sent to the LLM to be ignored.
 
-RULES:
-- Current school year: Fall 2025, Spring 2026
-- Only extract events dated {now.strftime('%Y-%m-%d')} or later
-- If a date is ambiguous, use the next upcoming occurrence
-- Include as much detail as available (times, locations, costs, links)
+    Removes excluded entries (board/committee meetings, secondary school info
+    nights, webinars) along with their time and address lines, plus student
+    calendar lines already parsed by parse_student_calendar_dates.
+    """
+    kept = []
+    skipping = False
+    for line in district_text.splitlines():
+        stripped = line.strip()
+        if skipping and _DISTRICT_DETAIL_RE.match(stripped):
+            continue
+        skipping = bool(_DISTRICT_DROP_RE.search(stripped))
+        if skipping:
+            continue
+        if any(stripped.endswith(desc) for desc in covered_descriptions):
+            continue
+        kept.append(line)
+    return "\n".join(kept)
 
-## PTA WEBSITE CONTENT:
-{pta_text}
-{images_context}
 
-Return ONLY valid JSON array, no other text."""
+def extract_events_from_district(district_text, covered_descriptions=()):
+    """Extract events from district calendar text.
+
+    covered_descriptions are student calendar descriptions already turned into
+    events locally; their lines are left out of the prompt.
+    """
+    client = _anthropic_client()
+
+    now = datetime.now()
+
+    filtered_text = _filter_district_text(district_text, covered_descriptions)
+    print(f"  Trimmed district text {len(district_text)} -> {len(filtered_text)} characters")
+
+    prompt = f"""TODAY'S DATE: {now.strftime('%Y-%m-%d')}
+Only extract events dated {now.strftime('%Y-%m-%d')} or later.
+
+## DISTRICT CALENDAR CONTENT:
+{filtered_text}"""
 
-    response = client.messages.create(
+    return _create_events(
+        client,
         model="claude-3-haiku-20240307",
         max_tokens=4096,
-        messages=[{"role": "user", "content": prompt}]
+        system=SYSTEM_PROMPT,
+        messages=[{"role": "user", "content": _user_content(DISTRICT_INSTRUCTIONS, prompt)}]
     )
 
-    return response.content[0].text
 
+def _match_threshold(date_a, date_b):
+    """Similarity two event names must exceed to be duplicates, given their dates.
 
-def extract_events_from_district(district_text):
-    """Extract events from district calendar text."""
-    client = Anthropic()
+    Same date needs > 0.7, a missing date needs > 0.8, and two different
+    dates never match (returns None). 0.7 sits above distinct same-day events
+    that share a word ("Galentine's Night Out" vs "Family Fun Night - Five
+    Guys" scores 0.60) and below reworded duplicates ("Winter Recess" vs
+    "Winter Break" scores 0.72).
+    """
+    if date_a and date_b:
+        return 0.7 if date_a == date_b else None
+    return 0.8
 
-    now = datetime.now()
 
-    prompt = f"""Extract upcoming events from this SJUSD district calendar that are relevant to ELEMENTARY SCHOOL students and parents.
+# Names with fewer tokens than this are scored with fuzz.ratio instead:
+# token_set_ratio scores a token subset as 100, so "Meeting" would match
+# every "... Meeting"
+_MIN_SET_TOKENS = 2
 
-TODAY'S DATE: {now.strftime('%Y-%m-%d')}
 
-Return a JSON array with these fields:
-- "name": Event name
-- "date": Date in YYYY-MM-DD format (null if unclear)
-- "time": Time of event if mentioned (e.g., "6:00 PM - 8:00 PM"), null if not stated
-- "type": "event" or "deadline"
-- "priority": "high" for school holidays/no-school days, "medium" for other events, "low" for minor items
-- "description": Brief description including location if available
-- "url": Related URL if mentioned (null if none)
-- "source": "district_calendar"
+def _similarity_matrix(queries, choices):
+    """Pairwise name similarity (0-1) between two lists of lowercased names.
 
-ONLY EXTRACT events that affect ELEMENTARY schools:
-- School holidays and recesses that affect ALL schools (Winter Recess, Spring Break, MLK Day, etc.)
-- Early dismissal or minimum days for elementary or all schools
-- District-wide events that affect elementary students
+    Computed with rapidfuzz cdist using token_set_ratio, so word order and
+    punctuation don't matter ("PTA Winter Dance" vs "Winter Dance (PTA)").
+    Pairs involving a name shorter than _MIN_SET_TOKENS use fuzz.ratio.
+    Scores below 0.7, the lowest duplicate threshold, come back as 0.
+    """
+    scores = process.cdist(
+        queries, choices,
+        scorer=fuzz.token_set_ratio, processor=utils.default_process, score_cutoff=70,
+    )
+    query_tokens = np.array([len(utils.default_process(q).split()) for q in queries], dtype=int)
+    choice_tokens = np.array([len(utils.default_process(c).split()) for c in choices], dtype=int)
+    short = np.minimum.outer(query_tokens, choice_tokens) < _MIN_SET_TOKENS
+    if short.any():
+        ratios = process.cdist(
+            queries, choices,
+            scorer=fuzz.ratio, processor=utils.default_process, score_cutoff=70,
+        )
+        scores = np.where(short, ratios, scores)
+    return scores / 100
 
-DO NOT EXTRACT:
-- Middle school information nights
-- High school information nights
-- Board of Education meetings
-- District committee meetings (PTOC, Schools of Tomorrow, CSH, VIP, etc.)
-- Advisory committees
-- Secondary-school-only early dismissals
-- Any event specific to a named middle or high school
-- Webinars or seminars for district staff
 
-RULES:
-- Current school year: Fall 2025, Spring 2026
-- Only extract events dated {now.strftime('%Y-%m-%d')} or later
-- For recesses and no-school days, set priority to "high"
+def _index_by_date(dates):
+    """Map each date (None when missing) to the indices where it appears."""
+    by_date = defaultdict(list)
+    for i, ev_date in enumerate(dates):
+        by_date[ev_date or None].append(i)
+    return by_date
 
-## DISTRICT CALENDAR CONTENT:
-{district_text}
 
-Return ONLY valid JSON array, no other text."""
+def _name_lowers(events):
+    """Lowercased name of each event, computed once per dedup pass."""
+    return [(event.get("name") or "").lower() for event in events]
 
-    response = client.messages.create(
-        model="claude-3-haiku-20240307",
-        max_tokens=4096,
-        messages=[{"role": "user", "content": prompt}]
-    )
 
-    return response.content[0].text
+def _drop_exact_duplicates(*groups):
+    """Drop events sharing a date and normalized name with an earlier event.
+
+    Groups are given in priority order; the first occurrence of each key is
+    kept. Returns one filtered list per group.
+    """
+    seen = set()
+    result = []
+    for group in groups:
+        kept = []
+        for event, name in zip(group, _name_lowers(group)):
+            key = (event.get("date"), _NON_WORD_RE.sub("", name))
+            if key not in seen:
+                seen.add(key)
+                kept.append(event)
+        result.append(kept)
+    return result
 
 
 def deduplicate_events(email_events, pta_events, district_events=None):
     """Merge email, PTA, and district events, removing duplicates.
 
     Priority order for duplicates: district > PTA > email
-    (more specific sources tend to have better details).
+    (more specific sources tend to have better details). Menu items never
+    come from other sources, so callers keep them out of email_events.
     """
+    # Exact duplicates are dropped by key lookup so the fuzzy passes below
+    # only compare the residual
+    district_events, pta_events, email_events = _drop_exact_duplicates(
+        district_events or [], pta_events or [], email_events or []
+    )
+
     # Combine PTA + district into one "enriched" pool
     enriched = list(pta_events or []) + list(district_events or [])
 
@@ -659,38 +1079,40 @@ def deduplicate_events(email_events, pta_events, district_events=None):
 
     merged = []
     used_enriched_indices = set()
+    scores = _similarity_matrix(_name_lowers(email_events), _name_lowers(enriched))
+    enriched_dates = [e.get("date") for e in enriched]
+    enriched_by_date = _index_by_date(enriched_dates)
 
-    for email_event in email_events:
-        email_name = (email_event.get("name") or "").lower()
+    for k, email_event in enumerate(email_events):
         email_date = email_event.get("date")
 
-        # Skip menu items — they never come from other sources
-        if email_event.get("type") in ("breakfast_menu", "lunch_menu"):
-            merged.append(email_event)
-            continue
-
         best_match_idx = None
         best_similarity = 0
 
-        for i, other_event in enumerate(enriched):
+        # A dated event can only match same-date or undated events; an
+        # undated one can only match names scoring above 0.8. Indices stay
+        # in ascending order so ties resolve to the earliest event.
+        if email_date:
+            candidates = sorted(enriched_by_date[email_date] + enriched_by_date[None])
+        else:
+            candidates = (scores[k] > 0.8).nonzero()[0].tolist()
+
+        for i in candidates:
             if i in used_enriched_indices:
                 continue
 
-            other_name = (other_event.get("name") or "").lower()
-            other_date = other_event.get("date")
+            other_date = enriched_dates[i]
+            threshold = _match_threshold(email_date, other_date)
+            if threshold is None:
+                continue
 
-            similarity = SequenceMatcher(None, email_name, other_name).ratio()
+            similarity = scores[k, i]
 
-            # Same date + similar name (>0.5) = duplicate
-            if email_date and other_date and email_date == other_date and similarity > 0.5:
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match_idx = i
-            # Very similar name (>0.8) when at least one has no date
-            elif similarity > 0.8 and (not email_date or not other_date):
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match_idx = i
+            # Same date + similar name (>0.7), or very similar name (>0.8)
+            # when at least one has no date = duplicate
+            if similarity > threshold and similarity > best_similarity:
+                best_similarity = similarity
+                best_match_idx = i
 
         if best_match_idx is not None:
             # Enriched version wins
@@ -716,22 +1138,24 @@ def _dedup_pair(primary, secondary):
         return secondary
 
     result = list(primary)
-    for sec_event in secondary:
-        sec_name = (sec_event.get("name") or "").lower()
-        sec_date = sec_event.get("date")
-        is_dup = False
-
-        for pri_event in primary:
-            pri_name = (pri_event.get("name") or "").lower()
-            pri_date = pri_event.get("date")
-            similarity = SequenceMatcher(None, sec_name, pri_name).ratio()
-
-            if sec_date and pri_date and sec_date == pri_date and similarity > 0.5:
-                is_dup = True
-                break
-            elif similarity > 0.8 and (not sec_date or not pri_date):
-                is_dup = True
-                break
+    scores = _similarity_matrix(_name_lowers(secondary), _name_lowers(primary))
+    pri_dates = [e.get("date") for e in primary]
+    sec_dates = [e.get("date") for e in secondary]
+    primary_by_date = _index_by_date(pri_dates)
+
+    for i, sec_event in enumerate(secondary):
+        sec_date = sec_dates[i]
+
+        # Only same-date and undated events can match a dated event
+        if sec_date:
+            candidates = primary_by_date[sec_date] + primary_by_date[None]
+        else:
+            candidates = range(len(primary))
+
+        is_dup = any(
+            scores[i, j] > _match_threshold(sec_date, pri_dates[j])
+            for j in candidates
+        )
 
         if not is_dup:
             result.append(sec_event)
@@ -744,45 +1168,55 @@ def _dedup_within(events):
     if len(events) <= 1:
         return events
 
+    names = _name_lowers(events)
+    dates = [e.get("date") for e in events]
+    scores = _similarity_matrix(names, names)
+
     keep = []
+    earlier_by_date = defaultdict(list)
     for i, event in enumerate(events):
-        name = (event.get("name") or "").lower()
-        ev_date = event.get("date")
-        is_dup = False
-
-        for j in range(i):
-            other = events[j]
-            other_name = (other.get("name") or "").lower()
-            other_date = other.get("date")
-            similarity = SequenceMatcher(None, name, other_name).ratio()
-
-            if ev_date and other_date and ev_date == other_date and similarity > 0.5:
-                is_dup = True
-                break
-            elif similarity > 0.8 and (not ev_date or not other_date):
-                is_dup = True
-                break
+        ev_date = dates[i]
+
+        # Compare against earlier events: same-date and undated ones for a
+        # dated event, all of them for an undated one
+        if ev_date:
+            candidates = earlier_by_date[ev_date] + earlier_by_date[None]
+        else:
+            candidates = range(i)
+
+        is_dup = any(
+            scores[i, j] > _match_threshold(ev_date, dates[j])
+            for j in candidates
+        )
 
         if not is_dup:
             keep.append(event)
+        earlier_by_date[ev_date or None].append(i)
 
     return keep
 
 
+# A known Monday, so (day - _EPOCH_MONDAY) % 7 gives date.weekday()
+_EPOCH_MONDAY = np.datetime64("1970-01-05")
+
+
+def _is_iso_date(value):
+    """Check that value is a real YYYY-MM-DD date (LLM dates can be "TBD")."""
+    try:
+        return len(value) == 10 and bool(date.fromisoformat(value))
+    except (TypeError, ValueError):
+        return False
+
+
 def consolidate_consecutive_dates(events):
     """Merge events with same name on consecutive dates into single entries."""
-    from collections import defaultdict
 
     # Separate events that should be consolidated vs those that shouldn't
     to_consolidate = []
     others = []
 
-    # Keywords that indicate multi-day events to consolidate
-    consolidate_keywords = ["recess", "no school", "holiday", "break", "vacation"]
-
     for event in events:
-        name = (event.get("name") or "").lower()
-        if any(kw in name for kw in consolidate_keywords) and event.get("date"):
+        if _is_iso_date(event.get("date")) and _CONSOLIDATE_RE.search(event.get("name") or ""):
             to_consolidate.append(event)
         else:
             others.append(event)
@@ -799,43 +1233,33 @@ def consolidate_consecutive_dates(events):
 
     consolidated = []
     for name, group in groups.items():
+        if len(group) == 1:
+            consolidated.append(group[0])
+            continue
+
         # Sort by date
         group.sort(key=lambda x: x.get("date", ""))
 
-        # Find consecutive date ranges
-        ranges = []
-        current_range = [group[0]]
-
-        for i in range(1, len(group)):
-            prev_date = date.fromisoformat(group[i - 1]["date"])
-            curr_date = date.fromisoformat(group[i]["date"])
-
-            # Check if consecutive (including skipping weekends)
-            diff = (curr_date - prev_date).days
-            if diff == 1 or (diff <= 3 and prev_date.weekday() == 4):  # Friday to Monday
-                current_range.append(group[i])
-            else:
-                ranges.append(current_range)
-                current_range = [group[i]]
-
-        ranges.append(current_range)
+        # Find consecutive date ranges (including Friday to Monday)
+        days = np.array([e["date"] for e in group], dtype="datetime64[D]")
+        diffs = np.diff(days).astype(int)
+        weekdays = (days[:-1] - _EPOCH_MONDAY).astype(int) % 7
+        consecutive = (diffs == 1) | ((diffs <= 3) & (weekdays == 4))
+        breakpoints = np.flatnonzero(~consecutive) + 1
 
         # Create consolidated events
-        for r in ranges:
-            if len(r) == 1:
-                consolidated.append(r[0])
+        for first, last in zip(np.r_[0, breakpoints], np.r_[breakpoints, len(group)] - 1):
+            if first == last:
+                consolidated.append(group[first])
             else:
                 # Merge into single event with date range
-                start_date = r[0]["date"]
-                end_date = r[-1]["date"]
+                merged = group[first].copy()
+                merged["date"] = group[first]["date"]
+                merged["end_date"] = group[last]["date"]
 
-                merged = r[0].copy()
-                merged["date"] = start_date
-                merged["end_date"] = end_date
-
-                # Format nice date range for display
-                start = date.fromisoformat(start_date)
-                end = date.fromisoformat(end_date)
+                # Format nice date range for display (dates already parsed above)
+                start = days[first].item()
+                end = days[last].item()
                 if start.month == end.month:
                     date_display = f"{start.strftime('%b %d')}-{end.strftime('%d')}"
                 else:
@@ -847,21 +1271,91 @@ def consolidate_consecutive_dates(events):
     return others + consolidated
 
 
+# Recovers complete items from a truncated JSON array (orjson has no raw_decode)
+_JSON_DECODER = json.JSONDecoder()
+_ITEM_SEP_RE = re.compile(r'[\s,]*')
+
+
 def parse_json_response(text):
     """Try to parse JSON, handling truncation."""
     try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        # Try to fix truncated JSON by finding last complete object
-        last_bracket = text.rfind('}')
-        if last_bracket > 0:
-            # Find matching array start
-            try:
-                fixed = text[:last_bracket+1] + ']'
-                return json.loads(fixed)
-            except:
-                pass
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        pass
+
+    # Truncated (or prose-wrapped) array: decode its items one at a time and
+    # keep every one that is complete
+    idx = text.find('[') + 1
+    if not idx:
         return None
+    items = []
+    while True:
+        idx = _ITEM_SEP_RE.match(text, idx).end()
+        if idx >= len(text) or text[idx] == ']':
+            break
+        try:
+            item, idx = _JSON_DECODER.raw_decode(text, idx)
+        except json.JSONDecodeError:
+            break
+        items.append(item)
+    return items or None
+
+
+# Per-thread print buffer of the extraction phase the thread is working for
+_phase_output = threading.local()
+
+
+class _PhaseStdout:
+    """sys.stdout stand-in that sends a phase thread's prints to its buffer."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        buffer = getattr(_phase_output, "buffer", None)
+        return (buffer or self.stream).write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def _capture_output(buffer):
+    """Send this thread's prints to buffer, or to the console for None."""
+    _phase_output.buffer = buffer
+
+
+def _phase_pool(max_workers):
+    """ThreadPoolExecutor whose threads print into the calling thread's phase buffer."""
+    return ThreadPoolExecutor(
+        max_workers=max_workers,
+        initializer=_capture_output,
+        initargs=(getattr(_phase_output, "buffer", None),),
+    )
+
+
+def _run_phase(fn, *args):
+    """Run fn with its prints collected. Returns (result, printed output)."""
+    buffer = io.StringIO()
+    _capture_output(buffer)
+    try:
+        return fn(*args), buffer.getvalue()
+    except Exception:
+        # Show what the phase printed before it failed
+        _capture_output(None)
+        print(buffer.getvalue(), end="")
+        raise
+    finally:
+        _capture_output(None)
+
+
+@contextlib.contextmanager
+def _phase_stdout():
+    """Route phase threads' prints to their buffers while the phases run."""
+    sys.stdout = _PhaseStdout(sys.stdout)
+    try:
+        yield
+    finally:
+        sys.stdout = sys.stdout.stream
 
 
 def main():
@@ -881,66 +1375,80 @@ def main():
     pta_events = []
     district_events = []
 
-    # Phase 1: Extract events from emails
-    if emails:
-        print("\nPhase 1: Extracting events from emails...")
-        events_result = extract_events_from_emails(emails)
-        events = parse_json_response(events_result)
+    # Phase 4a runs first: events it parses are left out of the district prompt
+    print("\nPhase 4a: Parsing student calendar dates...")
+    student_cal_events = parse_student_calendar_dates()
+    if student_cal_events:
+        district_events.extend(student_cal_events)
+        print(f"  Found {len(student_cal_events)} student calendar events")
+    else:
+        print("  No student calendar dates found")
+    covered = {e["description"] for e in student_cal_events}
+
+    # The Claude extractions don't depend on each other, so run them
+    # concurrently; wall-clock time is that of the slowest call. Each phase's
+    # prints are collected and shown under its header below
+    print("\nExtracting events from emails, menus, PTA website and district calendar...")
+    with _phase_stdout(), ThreadPoolExecutor(max_workers=4) as executor:
+        events_future = executor.submit(_run_phase, extract_events_from_emails, emails) if emails else None
+        menus_future = executor.submit(_run_phase, extract_menus, menus) if menus else None
+        pta_future = (
+            executor.submit(_run_phase, extract_events_from_pta, pta_text, pta_images)
+            if pta_text else None
+        )
+        district_future = (
+            executor.submit(_run_phase, extract_events_from_district, district_text, covered)
+            if district_text else None
+        )
+
+    # Phase 1: Events from emails
+    if events_future:
+        print("\nPhase 1: Events from emails")
+        events, output = events_future.result()
+        print(output, end="")
         if events:
             email_events.extend(events)
             print(f"  Found {len(events)} events/deadlines")
         else:
-            print("  WARNING: Could not parse events response")
-            with open("events_raw.txt", "w") as f:
-                f.write(events_result)
-
-    # Phase 2: Extract menus
-    if menus:
-        print("\nPhase 2: Extracting menus...")
-        menus_result = extract_menus(menus)
-        menu_items = parse_json_response(menus_result)
+            print("  WARNING: No events reported")
+
+    # Phase 2: Menus
+    if menus_future:
+        print("\nPhase 2: Menus")
+        menu_items, output = menus_future.result()
+        print(output, end="")
         if menu_items:
             menu_events.extend(menu_items)
             print(f"  Found {len(menu_items)} menu items")
         else:
-            print("  WARNING: Could not parse menus response")
-            with open("menus_raw.txt", "w") as f:
-                f.write(menus_result)
-
-    # Phase 3: Extract events from PTA website
-    if pta_text:
-        print("\nPhase 3: Extracting events from PTA website...")
-        pta_result = extract_events_from_pta(pta_text, pta_images)
-        pta_parsed = parse_json_response(pta_result)
+            print("  WARNING: No menu items reported")
+
+    # Phase 3: Events from PTA website
+    if pta_future:
+        print("\nPhase 3: Events from PTA website")
+        pta_parsed, output = pta_future.result()
+        print(output, end="")
         if pta_parsed:
             pta_events.extend(pta_parsed)
             print(f"  Found {len(pta_parsed)} PTA events")
         else:
-            print("  WARNING: Could not parse PTA events response")
-            with open("pta_events_raw.txt", "w") as f:
-                f.write(pta_result)
-
-    # Phase 4a: Parse student calendar dates directly (recesses, no-school days)
-    print("\nPhase 4a: Parsing student calendar dates...")
-    student_cal_events = parse_student_calendar_dates()
-    if student_cal_events:
-        district_events.extend(student_cal_events)
-        print(f"  Found {len(student_cal_events)} student calendar events")
-    else:
-        print("  No student calendar dates found")
+            print("  WARNING: No PTA events reported")
 
-    # Phase 4b: Extract other events from district calendar via LLM
-    if district_text:
-        print("\nPhase 4b: Extracting events from district calendar...")
-        district_result = extract_events_from_district(district_text)
-        district_parsed = parse_json_response(district_result)
+    # Phase 4b: Other events from district calendar via LLM
+    if district_future:
+        print("\nPhase 4b: Events from district calendar")
+        district_parsed, output = district_future.result()
+        print(output, end="")
         if district_parsed:
             district_events.extend(district_parsed)
             print(f"  Found {len(district_parsed)} district events")
         else:
-            print("  WARNING: Could not parse district events response")
-            with open("district_events_raw.txt", "w") as f:
-                f.write(district_result)
+            print("  WARNING: No district events reported")
+
+    # Menu items found in emails never come from other sources, so they
+    # skip dedup along with the menu file items
+    email_menu_events = [e for e in email_events if e.get("type") in ("breakfast_menu", "lunch_menu")]
+    email_events = [e for e in email_events if e.get("type") not in ("breakfast_menu", "lunch_menu")]
 
     # Deduplicate email + PTA + district events
     merged_events = deduplicate_events(email_events, pta_events, district_events)
@@ -949,7 +1457,7 @@ def main():
           f"+ {len(district_events)} district)")
 
     # Combine with menu events (no dedup needed for menus)
-    all_events = merged_events + menu_events
+    all_events = merged_events + email_menu_events + menu_events
 
     # Consolidate consecutive date events (e.g., Winter Recess Mon-Fri)
     print("\nConsolidating consecutive date events...")
@@ -959,8 +1467,7 @@ def main():
 
     # Save combined results
     if all_events:
-        with open(EVENTS_OUTPUT_FILE, "w") as f:
-            json.dump(all_events, f, indent=2)
+        _dump_json(all_events, EVENTS_OUTPUT_FILE)
         print(f"\nSaved {len(all_events)} total items to {EVENTS_OUTPUT_FILE}")
     else:
         print("\nNo events extracted.")
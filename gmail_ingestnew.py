@@ -1,6 +1,7 @@
 import ssl
 from imapclient import IMAPClient
 from elasticsearch import Elasticsearch, helpers
+from elasticsearch.serializer import OrjsonSerializer
 from datetime import datetime, timedelta
 import json
 import time
@@ -19,13 +20,26 @@ ELASTIC_API_KEY = os.getenv("ELASTIC_API_KEY")
 # --- 2. CONFIGURATION ---
 INDEX_NAME = "school-agent-final-data"
 LAST_CHECK_FILE = "last_check.txt"
+LAST_UID_FILE = "last_indexed_uid.txt"  # "UIDVALIDITY UID" of the last synced message
 VECTORIZATION_PIPELINE = "school-rag-vectorizer" # The pipeline created in Kibana
 
+# UIDs per IMAP FETCH; one huge FETCH can be rejected or stall on the server
+FETCH_BATCH = 100
+
+# Bulk indexing: worker threads, docs per request, and a byte cap per request
+# (emails run 20-200KB, so the byte cap usually ends a chunk first)
+THREAD_COUNT = int(os.getenv("THREAD_COUNT", "8"))
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
+MAX_CHUNK_BYTES = int(os.getenv("MAX_CHUNK_BYTES", str(50 * 1024 * 1024)))
+
 # --- 3. ELASTICSEARCH CLIENT INITIALIZATION ---
 try:
+    # orjson serializes the multi-KB email bodies in each bulk chunk far
+    # faster than the default stdlib json serializer
     es = Elasticsearch(
         cloud_id=ELASTIC_CLOUD_ID,
-        api_key=ELASTIC_API_KEY
+        api_key=ELASTIC_API_KEY,
+        serializer=OrjsonSerializer(),
     )
     es.info() 
     print("Elasticsearch client initialized successfully.")
@@ -48,6 +62,97 @@ def update_last_check_date():
     with open(LAST_CHECK_FILE, 'w') as f:
         f.write(datetime.now().strftime('%Y-%m-%d'))
 
+def load_last_uid():
+    """Reads the (uidvalidity, uid) checkpoint saved by the last sync, or None."""
+    try:
+        with open(LAST_UID_FILE, 'r') as f:
+            uidvalidity, uid = f.read().split()
+        return int(uidvalidity), int(uid)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def save_last_uid(uidvalidity, uid):
+    """Writes the checkpoint so the next sync only searches newer UIDs."""
+    with open(LAST_UID_FILE, 'w') as f:
+        f.write(f"{uidvalidity} {uid}\n")
+
+def fetch_in_batches(client, messages, fetch_items):
+    """Yields FETCH responses for messages, FETCH_BATCH UIDs per request."""
+    for i in range(0, len(messages), FETCH_BATCH):
+        yield client.fetch(messages[i:i + FETCH_BATCH], fetch_items)
+
+def fetch_envelopes(client, messages):
+    """Fetches ENVELOPE only and returns {uid: envelope} for "via ParentSquare" mail.
+
+    Envelopes are a tiny fraction of the message size, so this pass decides
+    which bodies are worth downloading at all.
+    """
+    envelopes = {}
+    for response in fetch_in_batches(client, messages, [b'ENVELOPE']):
+        for msg_id, data in response.items():
+            envelope = data[b'ENVELOPE']
+
+            # --- FILTER: STRICTLY ENFORCE "via ParentSquare" ---
+            # The server search only matched "parentsquare" somewhere in From
+            sender_name = envelope.from_[0].name if envelope.from_ else None
+            if sender_name and b'via ParentSquare' in sender_name:
+                envelopes[msg_id] = envelope
+    return envelopes
+
+def doc_id(uidvalidity, uid):
+    """Returns the Elasticsearch _id for a message.
+
+    UIDs are only unique within one UIDVALIDITY, so the id includes it; a
+    mailbox whose UIDs were reassigned can't collide with indexed messages.
+    """
+    return f"{uidvalidity}-{uid}"
+
+def filter_unindexed(uids, uidvalidity):
+    """Returns the UIDs that don't have a document in the index yet."""
+    missing = []
+    for i in range(0, len(uids), FETCH_BATCH):
+        batch = uids[i:i + FETCH_BATCH]
+        ids = [doc_id(uidvalidity, uid) for uid in batch]
+        result = es.mget(index=INDEX_NAME, ids=ids, source=False)
+        missing.extend(uid for uid, doc in zip(batch, result['docs']) if not doc.get('found'))
+    return missing
+
+def gen_actions(response, envelopes, uidvalidity):
+    """Yields one bulk index action per message in a BODY[] FETCH response.
+
+    Messages are popped from the response as they are processed, so each raw
+    body can be freed once its action has been sent instead of living until
+    the whole sync finishes.
+    """
+    for msg_id in list(response):
+        data = response.pop(msg_id)
+        envelope = envelopes[msg_id]
+
+        # --- EXTRACT METADATA ---
+        try:
+            sender_info = envelope.from_[0]
+            sender_address = sender_info.address.decode('utf-8') if sender_info.address else 'unknown@sender.com'
+        except Exception:
+            sender_address = 'unknown@sender.com'
+
+        subject = envelope.subject.decode('utf-8') if envelope.subject else 'No Subject'
+
+        # Construct the document for Elasticsearch; the body is decoded here,
+        # one message at a time, and the raw bytes dropped right after
+        doc = {
+            '@timestamp': datetime.now().isoformat(),
+            'subject': subject,
+            'sender_address': sender_address,
+            'body_full': data.pop(b'BODY[]').decode('utf-8', errors='ignore'),
+        }
+
+        yield {
+            '_op_type': 'index',    # Defines the operation type
+            '_index': INDEX_NAME,
+            '_id': doc_id(uidvalidity, msg_id),
+            '_source': doc,                     # The document data
+        }
+
 def ingest_emails():
     last_check_date = get_last_check_date()
     # IMAP search requires date format: "07-Nov-2025"
@@ -58,71 +163,80 @@ def ingest_emails():
     try:
         with IMAPClient('imap.gmail.com', port=993, ssl=True, ssl_context=context) as client:
             client.login(GMAIL_USER, GMAIL_PASS)
-            client.select_folder('INBOX')
+            uidvalidity = client.select_folder('INBOX')[b'UIDVALIDITY']
 
-            messages = client.search([b'SINCE', search_date.encode('utf-8')])
+            # Filter on the server so bodies are only downloaded for ParentSquare mail
+            criteria = ['SINCE', search_date, 'FROM', 'parentsquare']
+
+            # Only search past the last synced UID, unless UIDs were reassigned
+            min_uid = 0
+            last_uid = load_last_uid()
+            if last_uid and last_uid[0] == uidvalidity:
+                min_uid = last_uid[1] + 1
+                criteria += ['UID', f'{min_uid}:*']
+
+            # "N:*" always includes the newest message, so drop UIDs below N
+            messages = [uid for uid in client.search(criteria) if uid >= min_uid]
             
             if not messages:
                 print(f"No new emails found since {search_date}.")
                 return
 
-            print(f"Found {len(messages)} emails for processing. Starting ingestion...")
+            # Pass 1: envelopes only, then skip messages already in the index
+            envelopes = fetch_envelopes(client, messages)
+            to_fetch = filter_unindexed(sorted(envelopes), uidvalidity)
 
-            fetch_items = [b'BODY[]', b'ENVELOPE', b'BODY[HEADER.FIELDS (FROM)]']
-            response = client.fetch(messages, fetch_items)
-            
-            actions = []
-            for msg_id, data in response.items():
-                
-                raw_from_header = data.get(b'BODY[HEADER.FIELDS (FROM)]', b'').decode('utf-8', errors='ignore')
-                
-                # --- FILTER: STRICTLY ENFORCE "via ParentSquare" ---
-                if 'via ParentSquare' not in raw_from_header:
-                    continue 
-
-                # --- EXTRACT METADATA ---
-                envelope = data[b'ENVELOPE']
-                try:
-                    sender_info = envelope.from_[0]
-                    sender_address = sender_info.address.decode('utf-8') if sender_info.address else 'unknown@sender.com'
-                except Exception:
-                    sender_address = 'unknown@sender.com'
-
-                subject = envelope.subject.decode('utf-8') if envelope.subject else 'No Subject'
-                raw_body = data[b'BODY[]'].decode('utf-8', errors='ignore')
-
-                # Construct the document for Elasticsearch
-                doc = {
-                    '@timestamp': datetime.now().isoformat(), 
-                    'subject': subject,
-                    'sender_address': sender_address,
-                    'body_full': raw_body, 
-                }
-                
-                # --- THE CORRECTED ACTIONS.APPEND BLOCK (Inside the loop) ---
-                actions.append({
-                    '_op_type': 'index',    # Defines the operation type
-                    '_index': INDEX_NAME,
-                    '_id': str(msg_id),
-                    '_source': doc,                     # The document data
-                })
-            # --- END OF 'for' LOOP ---
+            if not to_fetch:
+                print(f"No unindexed ParentSquare emails among {len(messages)} found since {search_date}.")
+                save_last_uid(uidvalidity, max(messages))
+                return
+
+            print(f"Found {len(to_fetch)} new emails for processing. Starting ingestion...")
+
+            # Pass 2: bodies for the remaining UIDs, FETCH_BATCH at a time.
+            # parallel_bulk drains this generator on its own pool thread, so
+            # the FETCHes run there too. Actions are grouped into chunks of up
+            # to CHUNK_SIZE docs / MAX_CHUNK_BYTES, and up to
+            # max(queue_size, THREAD_COUNT) chunks can be queued while
+            # THREAD_COUNT more are being sent. Memory is bounded by those
+            # limits, not by a single FETCH batch
+            actions = (
+                action
+                for response in fetch_in_batches(client, to_fetch, [b'BODY[]'])
+                for action in gen_actions(response, envelopes, uidvalidity)
+            )
 
             # --- BULK INDEXING (Robust Error Handling) ---
-            if actions:
-                try:
-                    success, errors = helpers.bulk(es, actions, raise_on_error=True)
-                    print(f"Successfully indexed {success} documents. Errors: {len(errors)}")
-                
-                except helpers.BulkIndexError as e:
-                    print("\n--- ELASTICSEARCH BULK ERRORS FOUND ---")
-                    if hasattr(e, 'errors'):
-                        print(json.dumps(e.errors, indent=2)) 
-                    print("---------------------------------------")
-                    # Re-raise error to halt system for review
-                    raise SystemExit(f"FATAL INDEXING ERROR: {e.args[0]}") from e
-                
-                update_last_check_date() # Update history only if indexing was attempted
+            # Actions are generated lazily and sent in chunks by worker threads
+            indexed = 0
+            failures = []
+            for ok, info in helpers.parallel_bulk(
+                es,
+                actions,
+                thread_count=THREAD_COUNT,
+                chunk_size=CHUNK_SIZE,
+                max_chunk_bytes=MAX_CHUNK_BYTES,
+                queue_size=4,
+                raise_on_error=False,
+            ):
+                if ok:
+                    indexed += 1
+                else:
+                    failures.append(info)
+
+            if indexed or failures:
+                print(f"Successfully indexed {indexed} documents. Errors: {len(failures)}")
+
+            if failures:
+                print("\n--- ELASTICSEARCH BULK ERRORS FOUND ---")
+                print(json.dumps(failures, indent=2, default=str))
+                print("---------------------------------------")
+                # Halt system for review
+                raise SystemExit(f"FATAL INDEXING ERROR: {len(failures)} document(s) failed to index.")
+
+            if indexed:
+                update_last_check_date() # Update history only if indexing succeeded
+            save_last_uid(uidvalidity, max(messages))
 
     except Exception as e:
         print(f"FATAL IMAP CONNECTION ERROR: {e}")
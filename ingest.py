@@ -1,8 +1,10 @@
 import os
-import json
 from datetime import date
+from itertools import chain
+
+import orjson
 from dotenv import load_dotenv
-from imap_tools import MailBox, AND
+from imap_tools import MailBox, AND, U
 from tqdm import tqdm
 
 load_dotenv()
@@ -12,34 +14,62 @@ GMAIL_PASSWORD = os.getenv("GMAIL_PASSWORD")
 
 # School year start date
 SCHOOL_YEAR_START = date(2025, 8, 1)
-BATCH_SIZE = 50
+BATCH_SIZE = 100
 OUTPUT_FILE = "raw_emails.json"
+# "<UIDVALIDITY> <highest fetched UID>" from the last successful run
+LAST_UID_FILE = "last_uid.txt"
+
+
+def load_last_uid():
+    """Read the (uidvalidity, uid) checkpoint saved by the last run, or None."""
+    try:
+        with open(LAST_UID_FILE) as f:
+            uidvalidity, uid = f.read().split()
+        return int(uidvalidity), int(uid)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def save_last_uid(uidvalidity, uid):
+    """Persist the checkpoint for the next incremental sync."""
+    with open(LAST_UID_FILE, "w") as f:
+        f.write(f"{uidvalidity} {uid}\n")
 
 
-def fetch_parentsquare_emails(since_date=SCHOOL_YEAR_START):
-    """Fetch all ParentSquare emails since the given date."""
+def fetch_parentsquare_emails(since_date=SCHOOL_YEAR_START, last_uid=None):
+    """Fetch ParentSquare emails since the given date.
+
+    With a last_uid checkpoint from load_last_uid(), only messages with a
+    higher UID are fetched, unless the mailbox's UIDVALIDITY has changed since.
+    Returns (emails, uidvalidity).
+    """
     with MailBox("imap.gmail.com").login(GMAIL_EMAIL, GMAIL_PASSWORD) as mailbox:
+        uidvalidity = mailbox.folder.status()["UIDVALIDITY"]
+
         # Search for emails from ParentSquare since school year start
         criteria = AND(from_="parentsquare", date_gte=since_date)
+        min_uid = 0
+        if last_uid and last_uid[0] == uidvalidity:
+            min_uid = last_uid[1] + 1
+            criteria = AND(criteria, uid=U(min_uid, "*"))
 
-        # Get all matching message UIDs first (lightweight)
-        uids = list(mailbox.uids(criteria))
-        total_count = len(uids)
+        # Count matching messages first (lightweight). "N:*" always includes
+        # the newest message, so UIDs below N are filtered out here too
+        total_count = sum(int(uid) >= min_uid for uid in mailbox.uids(criteria))
 
         if total_count == 0:
-            print("No ParentSquare emails found.")
-            return []
-
-        print(f"Found {total_count} ParentSquare emails since {since_date}")
+            print("No new ParentSquare emails found.")
+            return [], uidvalidity
 
-        # Fetch in batches with progress bar
-        all_emails = []
-        for i in tqdm(range(0, total_count, BATCH_SIZE), desc="Fetching batches"):
-            batch_uids = uids[i:i + BATCH_SIZE]
-            batch_emails = list(mailbox.fetch(AND(uid=batch_uids)))
-            all_emails.extend(batch_emails)
+        print(f"Found {total_count} new ParentSquare emails since {since_date}")
 
-        return all_emails
+        # Fetch BATCH_SIZE messages per FETCH command; one SEARCH covers all
+        # batches instead of a UID search per batch
+        emails = (
+            email for email in mailbox.fetch(criteria, bulk=BATCH_SIZE)
+            if int(email.uid) >= min_uid
+        )
+        return list(tqdm(emails, total=total_count, desc="Fetching emails")), uidvalidity
 
 
 def email_to_dict(email):
@@ -53,12 +83,29 @@ def email_to_dict(email):
     }
 
 
-def save_emails(emails, filename=OUTPUT_FILE):
-    """Save emails to JSON file."""
-    data = [email_to_dict(e) for e in tqdm(emails, desc="Processing")]
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=2)
-    print(f"Saved {len(data)} emails to {filename}")
+def save_emails(emails, filename=OUTPUT_FILE, append=False):
+    """Save emails to a JSON array file, one email per line.
+
+    Each email is converted and serialized as it is written rather than
+    building the whole list of dicts first. With append=True, emails are
+    merged into the existing file by uid instead of replacing it.
+    """
+    records = (email_to_dict(e) for e in tqdm(emails, desc="Processing"))
+    if append:
+        new_uids = {e.uid for e in emails}
+        with open(filename, "rb") as f:
+            existing = [d for d in orjson.loads(f.read()) if d["uid"] not in new_uids]
+        records = chain(existing, records)
+
+    count = 0
+    with open(filename, "wb") as f:
+        f.write(b"[")
+        for record in records:
+            f.write(b",\n" if count else b"\n")
+            f.write(orjson.dumps(record))
+            count += 1
+        f.write(b"\n]\n")
+    print(f"Saved {count} emails to {filename}")
 
 
 if __name__ == "__main__":
@@ -66,7 +113,10 @@ if __name__ == "__main__":
     print(f"Fetching emails since: {SCHOOL_YEAR_START}")
     print("-" * 50)
 
-    emails = fetch_parentsquare_emails()
+    # Incremental sync only makes sense on top of an existing output file
+    last_uid = load_last_uid() if os.path.exists(OUTPUT_FILE) else None
+    emails, uidvalidity = fetch_parentsquare_emails(last_uid=last_uid)
 
     if emails:
-        save_emails(emails)
+        save_emails(emails, append=bool(last_uid and last_uid[0] == uidvalidity))
+        save_last_uid(uidvalidity, max(int(e.uid) for e in emails))
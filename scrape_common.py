@@ -0,0 +1,88 @@
+import json
+import re
+from datetime import datetime
+
+from lxml import etree
+from lxml import html as lxml_html
+
+# Elements that never hold page content; emptied in one tree pass
+NON_CONTENT_TAGS = ["script", "style", "nav", "footer", "header", "noscript"]
+
+# Where the main content lives, most specific first
+CONTENT_PATHS = (".//main", ".//div[@role='main']", "body")
+
+# Runs of blank (or whitespace-only) lines in extracted page text
+BLANK_RE = re.compile(r'\n\s*\n+')
+
+
+def load_cached(path):
+    """Load a scraper's cached JSON data, or {} if there is none."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def conditional_headers(cached):
+    """Conditional GET headers from the ETag/Last-Modified saved with cached data."""
+    headers = {}
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+def page_validators(response):
+    """ETag/Last-Modified of a response, to save alongside the scraped data."""
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+def touch_cache(path, cached):
+    """Restart a cache's TTL after the server reported the page unchanged."""
+    cached["scraped_at"] = datetime.now().isoformat()
+    with open(path, "w") as f:
+        json.dump(cached, f, indent=2)
+
+
+def parse_html(content, encoding=None):
+    """Parse page HTML into an lxml tree.
+
+    Takes the raw bytes (a str with an XML encoding declaration is rejected
+    by lxml), decoded as encoding when the response declared one. An empty
+    page gives an empty <html> element.
+    """
+    parser = lxml_html.HTMLParser(encoding=encoding)
+    try:
+        return lxml_html.document_fromstring(content, parser=parser)
+    except etree.ParserError:
+        return lxml_html.Element("html")
+
+
+def extract_text(tree):
+    """Extract main content text from a parse_html tree, stripping nav/footer/scripts.
+
+    Empties those elements in the tree. The text matches BeautifulSoup's
+    get_text(separator="\n", strip=True).
+    """
+    # Empty non-content elements rather than removing them, so the text on
+    # either side stays two separate strings as it does in BeautifulSoup
+    for el in list(tree.iter(*NON_CONTENT_TAGS)):
+        el.clear(keep_tail=True)
+
+    # Try to find main content area
+    main = tree
+    for path in CONTENT_PATHS:
+        found = tree.find(path)
+        if found is not None:
+            main = found
+            break
+
+    text = "\n".join(s for s in (t.strip() for t in main.itertext()) if s)
+
+    # Collapse excessive blank lines
+    return BLANK_RE.sub("\n", text).strip()
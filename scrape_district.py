@@ -1,5 +1,6 @@
 import io
 import json
+import re
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -7,11 +8,22 @@ import requests
 from bs4 import BeautifulSoup
 from pypdf import PdfReader
 
+from scrape_common import (
+    conditional_headers, extract_text, load_cached, page_validators, parse_html, touch_cache,
+)
+
 DISTRICT_URL = "https://www.sjusd.org/events"
 DATA_DIR = Path("data")
 DISTRICT_FILE = DATA_DIR / "district_calendar.json"
 CACHE_HOURS = 24
 
+# Links to documents in the district's resource manager (calendar PDFs etc.)
+RESOURCE_LINK_RE = re.compile(r'/fs/resource-manager/view/')
+
+# The events page and the student calendar PDF are on the same host, so one
+# session reuses the connection
+SESSION = requests.Session()
+
 
 def is_cache_fresh():
     """Check if cached district calendar data is less than 24 hours old."""
@@ -25,40 +37,27 @@ def is_cache_fresh():
     return datetime.now() - scraped_at < timedelta(hours=CACHE_HOURS)
 
 
-def fetch_calendar_page(month, year):
-    """Fetch the district calendar page for a given month/year."""
-    response = requests.get(
+def fetch_calendar_page(month, year, cached=None):
+    """Fetch the district calendar page for a given month/year.
+
+    The request is conditional on the ETag/Last-Modified saved in cached.
+    Returns the response, or None if the page hasn't changed.
+    """
+    response = SESSION.get(
         DISTRICT_URL,
         params={"month": month, "year": year},
+        headers=conditional_headers(cached or {}),
         timeout=30,
     )
+    if response.status_code == 304:
+        return None
     response.raise_for_status()
-    return response.text
-
-
-def extract_text(html):
-    """Extract main content text from HTML, stripping nav/footer/scripts."""
-    soup = BeautifulSoup(html, "html.parser")
-
-    # Remove non-content elements
-    for tag in soup.find_all(["script", "style", "nav", "footer", "header", "noscript"]):
-        tag.decompose()
-
-    # Try to find main content area
-    main = soup.find("main") or soup.find("div", {"role": "main"}) or soup.find("body")
-    if main is None:
-        main = soup
-
-    text = main.get_text(separator="\n", strip=True)
-
-    # Collapse excessive blank lines
-    lines = [line for line in text.splitlines() if line.strip()]
-    return "\n".join(lines)
+    return response
 
 
 def find_student_calendar_url(html):
     """Find the student calendar PDF URL for the current school year."""
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, "lxml")
     now = datetime.now()
 
     # Determine the current school year label (e.g., "2025-2026")
@@ -68,28 +67,24 @@ def find_student_calendar_url(html):
     else:
         school_year = f"{now.year - 1}-{now.year}"
 
-    # Find links containing the school year near "Student calendar" or "English"
-    for link in soup.find_all("a", href=True):
-        href = link["href"]
-        if "/fs/resource-manager/view/" not in href:
+    # Find English resource-manager links with the school year in the
+    # surrounding text, preferring one that mentions "student". Parent text is
+    # only built for links whose own text already says English
+    fallback = None
+    for link in soup.find_all("a", href=RESOURCE_LINK_RE):
+        text_context = link.get_text(strip=True).lower()
+        if "english" not in text_context:
             continue
-        # Walk nearby text to see if this is a student calendar link
-        text_context = link.get_text(strip=True)
         parent_text = link.parent.get_text(separator=" ", strip=True) if link.parent else ""
+        if school_year not in parent_text:
+            continue
         # Look for the English student calendar for the current school year
-        if school_year in parent_text and "english" in text_context.lower():
-            if "student" in parent_text.lower() or "student" in text_context.lower():
-                return href
+        if "student" in parent_text.lower() or "student" in text_context:
+            return link["href"]
+        if fallback is None:
+            fallback = link["href"]
 
-    # Fallback: find any link with the school year and resource-manager
-    for link in soup.find_all("a", href=True):
-        href = link["href"]
-        if "/fs/resource-manager/view/" in href:
-            parent_text = link.parent.get_text(separator=" ", strip=True) if link.parent else ""
-            if school_year in parent_text and "english" in link.get_text(strip=True).lower():
-                return href
-
-    return None
+    return fallback
 
 
 def fetch_student_calendar_pdf(html):
@@ -106,7 +101,7 @@ def fetch_student_calendar_pdf(html):
         pdf_url = pdf_path
 
     print(f"  Downloading student calendar PDF...")
-    response = requests.get(pdf_url, timeout=30, allow_redirects=True)
+    response = SESSION.get(pdf_url, timeout=30, allow_redirects=True)
     response.raise_for_status()
 
     reader = PdfReader(io.BytesIO(response.content))
@@ -121,14 +116,18 @@ def fetch_student_calendar_pdf(html):
     return combined
 
 
-def save_district_data(text, student_calendar_text=None):
-    """Save scraped district calendar data to JSON."""
+def save_district_data(text, student_calendar_text=None, page_info=None):
+    """Save scraped district calendar data to JSON.
+
+    page_info holds the events page's month label and ETag/Last-Modified.
+    """
     DATA_DIR.mkdir(exist_ok=True)
 
     data = {
         "source_url": DISTRICT_URL,
         "scraped_at": datetime.now().isoformat(),
         "text": text,
+        **(page_info or {}),
     }
     if student_calendar_text:
         data["student_calendar"] = student_calendar_text
@@ -151,10 +150,19 @@ def main():
     # Fetch the events page (current month)
     month_name = now.strftime("%B %Y")
     print(f"Fetching district calendar: {month_name}")
-    html = fetch_calendar_page(now.month, now.year)
+    # Saved validators only apply to the same month's page
+    cached = load_cached(DISTRICT_FILE)
+    if cached.get("month") != month_name:
+        cached = {}
+    response = fetch_calendar_page(now.month, now.year, cached)
+    if response is None:
+        touch_cache(DISTRICT_FILE, cached)
+        print("  District calendar unchanged since last scrape. Keeping cached data.")
+        return
+    html = response.text
 
     print(f"  Extracting text content for {month_name}...")
-    events_text = extract_text(html)
+    events_text = extract_text(parse_html(response.content, response.encoding))
     print(f"  Extracted {len(events_text)} characters")
 
     # Also fetch the student calendar PDF (has all important dates for the year)
@@ -162,7 +170,8 @@ def main():
     student_cal_text = fetch_student_calendar_pdf(html)
 
     combined = f"=== {month_name} Events ===\n{events_text}"
-    output = save_district_data(combined, student_cal_text)
+    page_info = {"month": month_name, **page_validators(response)}
+    output = save_district_data(combined, student_cal_text, page_info)
     print(f"\nSaved combined calendar to {output}")
 
 
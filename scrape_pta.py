@@ -1,15 +1,23 @@
 import json
+import re
 from datetime import datetime, timedelta
 from pathlib import Path
+from urllib.parse import urljoin
 
 import requests
-from bs4 import BeautifulSoup
+
+from scrape_common import (
+    conditional_headers, extract_text, load_cached, page_validators, parse_html, touch_cache,
+)
 
 PTA_URL = "https://losalamitospta.membershiptoolkit.com/home"
 DATA_DIR = Path("data")
 PTA_FILE = DATA_DIR / "pta_page.json"
 CACHE_HOURS = 24
 
+# Image src/alt fragments that mark icons and decoration rather than flyers
+SKIP_RE = re.compile(r'logo|icon|avatar|profile|spacer|pixel', re.IGNORECASE)
+
 
 def is_cache_fresh():
     """Check if cached PTA data is less than 24 hours old."""
@@ -23,73 +31,51 @@ def is_cache_fresh():
     return datetime.now() - scraped_at < timedelta(hours=CACHE_HOURS)
 
 
-def fetch_pta_page(url):
-    """Fetch the PTA homepage HTML."""
-    response = requests.get(url, timeout=30)
-    response.raise_for_status()
-    return response.text
-
-
-def extract_text(html):
-    """Extract main content text from HTML, stripping nav/footer/scripts."""
-    soup = BeautifulSoup(html, "html.parser")
-
-    # Remove non-content elements
-    for tag in soup.find_all(["script", "style", "nav", "footer", "header", "noscript"]):
-        tag.decompose()
-
-    # Try to find main content area
-    main = soup.find("main") or soup.find("div", {"role": "main"}) or soup.find("body")
-    if main is None:
-        main = soup
-
-    text = main.get_text(separator="\n", strip=True)
-
-    # Collapse excessive blank lines
-    lines = [line for line in text.splitlines() if line.strip()]
-    return "\n".join(lines)
+def fetch_pta_page(url, cached=None):
+    """Fetch the PTA homepage.
 
+    The request is conditional on the ETag/Last-Modified saved in cached.
+    Returns the response, or None if the page hasn't changed.
+    """
+    response = requests.get(url, headers=conditional_headers(cached or {}), timeout=30)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+    return response
 
-def extract_images(html, base_url):
-    """Extract image URLs from HTML, focusing on event flyers."""
-    soup = BeautifulSoup(html, "html.parser")
 
+def extract_images(tree, base_url):
+    """Extract image URLs from a parsed page tree, focusing on event flyers."""
     images = []
-    for img in soup.find_all("img"):
-        src = img.get("src", "")
+    for img in tree.iter("img"):
+        src = img.get("src")
         alt = img.get("alt", "")
 
         # Skip tiny images (icons, spacers)
-        width = img.get("width", "")
-        height = img.get("height", "")
-        if width and width.isdigit() and int(width) < 50:
-            continue
-        if height and height.isdigit() and int(height) < 50:
+        sizes = (img.get("width", ""), img.get("height", ""))
+        if any(size.isdigit() and int(size) < 50 for size in sizes):
             continue
 
-        # Skip common non-flyer images
-        skip_patterns = ["logo", "icon", "avatar", "profile", "spacer", "pixel"]
-        if any(p in src.lower() or p in alt.lower() for p in skip_patterns):
+        # Skip empty sources and common non-flyer images
+        if not src or SKIP_RE.search(src + " " + alt):
             continue
 
-        if src:
-            # Make absolute URL if needed
-            if src.startswith("//"):
-                src = "https:" + src
-            elif src.startswith("/"):
-                from urllib.parse import urljoin
-                src = urljoin(base_url, src)
+        # Make absolute URL if needed
+        if src.startswith("//"):
+            src = "https:" + src
+        elif src.startswith("/"):
+            src = urljoin(base_url, src)
 
-            images.append({
-                "url": src,
-                "alt": alt,
-            })
+        images.append({
+            "url": src,
+            "alt": alt,
+        })
 
     return images
 
 
-def save_pta_data(text, url, images=None):
-    """Save scraped PTA data to JSON."""
+def save_pta_data(text, url, images=None, validators=None):
+    """Save scraped PTA data to JSON, with the page's ETag/Last-Modified."""
     DATA_DIR.mkdir(exist_ok=True)
 
     data = {
@@ -97,6 +83,7 @@ def save_pta_data(text, url, images=None):
         "scraped_at": datetime.now().isoformat(),
         "text": text,
         "images": images or [],
+        **(validators or {}),
     }
 
     with open(PTA_FILE, "w") as f:
@@ -112,18 +99,26 @@ def main(force=False):
         print(f"  Cached file: {PTA_FILE}")
         return
 
-    print(f"Fetching PTA page: {PTA_URL}")
-    html = fetch_pta_page(PTA_URL)
+    cached = {} if force else load_cached(PTA_FILE)
 
-    print("Extracting text content...")
-    text = extract_text(html)
+    print(f"Fetching PTA page: {PTA_URL}")
+    response = fetch_pta_page(PTA_URL, cached)
+    if response is None:
+        touch_cache(PTA_FILE, cached)
+        print("PTA page unchanged since last scrape. Keeping cached data.")
+        return
+    tree = parse_html(response.content, response.encoding)
 
+    # Images first: extract_text empties nav/header/footer in the tree
     print("Extracting images...")
-    images = extract_images(html, PTA_URL)
+    images = extract_images(tree, PTA_URL)
+
+    print("Extracting text content...")
+    text = extract_text(tree)
 
     print(f"Extracted {len(text)} characters of text and {len(images)} images")
 
-    output = save_pta_data(text, PTA_URL, images)
+    output = save_pta_data(text, PTA_URL, images, page_validators(response))
     print(f"Saved to {output}")
 
     if images:
@@ -1,26 +1,49 @@
+import hashlib
 import os
-import json
+import re
 import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from urllib.parse import urljoin
 
+import orjson
+import pymupdf
 import requests
 from bs4 import BeautifulSoup
-from pypdf import PdfReader
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+from scrape_common import conditional_headers, page_validators
+
 load_dotenv()
 
 STUDENT_NUTRITION_URL = os.getenv("STUDENT_NUTRITION_URL")
 DATA_DIR = Path("data")
 
+# PDF URL -> {"etag", "last_modified", "sha256"} from the last download.
+# Extracted text is stored once per content hash and extractor in PDF_TEXT_DIR,
+# so text from an older extractor is never served after switching
+PDF_CACHE_FILE = DATA_DIR / ".pdf_cache.json"
+PDF_TEXT_DIR = DATA_DIR / "pdfcache"
+PDF_EXTRACTOR = "pymupdf"
+
+# Concurrent PDF downloads; the session pool is sized to keep them all alive
+PDF_WORKERS = 8
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
 
 MONTH_NAMES = [
     "january", "february", "march", "april", "may", "june",
     "july", "august", "september", "october", "november", "december",
 ]
 
+# Single-pass counters for detect_month_from_text and classify_menu. No word
+# boundaries: extracted PDF text often runs words together ("16-20February")
+MONTH_RE = re.compile("|".join(MONTH_NAMES), re.IGNORECASE)
+MENU_WORD_RE = re.compile(r'elementary|breakfast|lunch', re.IGNORECASE)
+
 
 def get_month_suffix():
     """Get current month suffix (e.g., JAN_2026)."""
@@ -33,16 +56,16 @@ def detect_month_from_text(text):
 
     Returns (month_abbr, year) like ('FEB', 2026) or None.
     """
-    text_lower = text.lower()
     now = datetime.now()
 
     # Check for month names in the text — take the one that appears most
+    # (the earliest month wins a tie)
+    counts = Counter(m.group().lower() for m in MONTH_RE.finditer(text))
     best_month = None
     best_count = 0
     for i, name in enumerate(MONTH_NAMES):
-        count = text_lower.count(name)
-        if count > best_count:
-            best_count = count
+        if counts[name] > best_count:
+            best_count = counts[name]
             best_month = i + 1  # 1-based month number
 
     if best_month and best_count >= 2:
@@ -59,10 +82,10 @@ def detect_month_from_text(text):
 
 def find_pdf_links(url):
     """Fetch page and find all PDF links."""
-    response = requests.get(url, timeout=30)
+    response = SESSION.get(url, timeout=30)
     response.raise_for_status()
 
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = BeautifulSoup(response.text, "lxml")
     pdf_links = []
 
     for link in soup.find_all("a", href=True):
@@ -80,35 +103,83 @@ def find_pdf_links(url):
     return pdf_links
 
 
-def download_and_extract_pdf(pdf_url):
-    """Download PDF and extract text."""
-    response = requests.get(pdf_url, timeout=60)
+def load_pdf_cache():
+    """Load the PDF download cache manifest."""
+    try:
+        return orjson.loads(PDF_CACHE_FILE.read_bytes())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return {}
+
+
+def save_pdf_cache(cache):
+    """Save the PDF download cache manifest."""
+    DATA_DIR.mkdir(exist_ok=True)
+    PDF_CACHE_FILE.write_bytes(orjson.dumps(cache, option=orjson.OPT_INDENT_2))
+
+
+def download_and_extract_pdf(pdf_url, cached=None):
+    """Download PDF and extract text, reusing cached text when it hasn't changed.
+
+    cached is the URL's entry from the PDF cache, if any. The request is
+    conditional on its ETag/Last-Modified, and a PDF whose content hash was
+    already extracted is not parsed again. Returns (text, cache entry).
+    """
+    response = SESSION.get(pdf_url, headers=conditional_headers(cached or {}), timeout=60)
+    if response.status_code == 304:
+        text_path = _pdf_text_path(cached["sha256"])
+        if text_path.exists():
+            return text_path.read_text(encoding="utf-8"), cached
+        # Cached text went missing; download it again
+        response = SESSION.get(pdf_url, timeout=60)
     response.raise_for_status()
 
-    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
-        tmp.write(response.content)
-        tmp_path = tmp.name
+    entry = {
+        **page_validators(response),
+        "sha256": hashlib.sha256(response.content).hexdigest(),
+    }
+    text_path = _pdf_text_path(entry["sha256"])
+    if text_path.exists():
+        return text_path.read_text(encoding="utf-8"), entry
+
+    text = _extract_pdf_text(response.content)
+    _write_text_atomic(text_path, text)
+    return text, entry
 
-    try:
-        reader = PdfReader(tmp_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
-    finally:
-        os.unlink(tmp_path)
+
+def _pdf_text_path(sha256):
+    """Where the PDF_EXTRACTOR text of the PDF with this content hash is stored."""
+    return PDF_TEXT_DIR / f"{sha256}.{PDF_EXTRACTOR}.txt"
+
+
+def _write_text_atomic(path, text):
+    """Write text to path via a temp file in the same directory.
+
+    PDF worker threads read these files while others write them, and a crash
+    mid-write must not leave a truncated file to be served as cached text.
+    """
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=path.parent, suffix=".tmp", delete=False,
+    ) as f:
+        f.write(text)
+    os.replace(f.name, path)
+
+
+def _extract_pdf_text(content):
+    """Extract text from PDF bytes with PyMuPDF, reading straight from memory."""
+    with pymupdf.open(stream=content, filetype="pdf") as doc:
+        return "".join(page.get_text() for page in doc)
 
 
 def classify_menu(text):
     """Classify menu based on content. Returns (level, meal_type) or None."""
-    text_lower = text.lower()
+    counts = Counter(m.group().lower() for m in MENU_WORD_RE.finditer(text))
 
     # Check for Elementary
-    is_elementary = "elementary" in text_lower
+    is_elementary = counts["elementary"] > 0
 
     # Count occurrences to determine primary meal type
-    breakfast_count = text_lower.count("breakfast")
-    lunch_count = text_lower.count("lunch")
+    breakfast_count = counts["breakfast"]
+    lunch_count = counts["lunch"]
 
     # Determine meal type by which appears more frequently
     if is_elementary:
@@ -155,8 +226,7 @@ def save_menu(text, source_url, filename, level, meal_type):
         "text": text,
     }
 
-    with open(filepath, "w") as f:
-        json.dump(data, f, indent=2)
+    filepath.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
     return output_filename
 
@@ -176,28 +246,40 @@ def scrape_menus():
 
     kept = []
     discarded = 0
-
-    for pdf in pdf_links:
-        print(f"  Checking: {pdf['filename'][:50]}...", end=" ")
-
-        try:
-            text = download_and_extract_pdf(pdf["url"])
-            classification = classify_menu(text)
-
-            if classification:
-                level, meal_type = classification
-                output_file = save_menu(
-                    text, pdf["url"], pdf["filename"], level, meal_type
-                )
-                kept.append((output_file, level, meal_type))
-                print(f"-> {level} {meal_type}")
-            else:
+    pdf_cache = load_pdf_cache()
+    PDF_TEXT_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Downloads run concurrently; results are handled in link order so output
+    # and save_menu's file numbering stay deterministic
+    with ThreadPoolExecutor(max_workers=PDF_WORKERS) as executor:
+        futures = [
+            executor.submit(download_and_extract_pdf, pdf["url"], pdf_cache.get(pdf["url"]))
+            for pdf in pdf_links
+        ]
+
+        for pdf, future in zip(pdf_links, futures):
+            print(f"  Checking: {pdf['filename'][:50]}...", end=" ")
+
+            try:
+                text, pdf_cache[pdf["url"]] = future.result()
+                classification = classify_menu(text)
+
+                if classification:
+                    level, meal_type = classification
+                    output_file = save_menu(
+                        text, pdf["url"], pdf["filename"], level, meal_type
+                    )
+                    kept.append((output_file, level, meal_type))
+                    print(f"-> {level} {meal_type}")
+                else:
+                    discarded += 1
+                    print("-> discarded (not elementary breakfast/lunch)")
+
+            except Exception as e:
                 discarded += 1
-                print("-> discarded (not elementary breakfast/lunch)")
+                print(f"-> ERROR: {e}")
 
-        except Exception as e:
-            discarded += 1
-            print(f"-> ERROR: {e}")
+    save_pdf_cache(pdf_cache)
 
     # Summary
     print("\n" + "=" * 50)